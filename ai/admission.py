@@ -0,0 +1,73 @@
+import time
+from typing import Optional
+
+
+class DeadlineExceeded(Exception):
+    """
+    Raised instead of running work whose deadline passed while it was queued.
+    """
+
+
+class ModelStopped(Exception):
+    """
+    Raised for work still queued on a model version when it is stopped. A
+    retry is routed to whichever version is serving now.
+    """
+
+
+def deadline_after(ms: float) -> Optional[float]:
+    """
+    time.monotonic() deadline `ms` from now, or None when ms <= 0 (no deadline).
+    """
+    return time.monotonic() + ms / 1000.0 if ms > 0 else None
+
+
+def check_deadline(deadline: Optional[float]):
+    if deadline is not None and time.monotonic() > deadline:
+        raise DeadlineExceeded("Request deadline passed before inference started")
+
+
+class AdmissionController:
+    """
+    Caps the number of images in flight (decoding, queued or running).
+
+    Past the cap new requests are rejected up front, so a burst gets fast 429s
+    instead of a queue that grows until every client times out.
+    """
+
+    def __init__(self, max_in_flight: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.expired = 0
+
+    def try_acquire(self, images: int = 1) -> bool:
+        """
+        Take `images` slots, or count a rejection and return False if that would
+        exceed the cap. Only called from the event loop, so no lock is needed.
+        """
+        if self.in_flight + images > self.max_in_flight:
+            self.rejected += 1
+            return False
+        self.in_flight += images
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.admitted += 1
+        return True
+
+    def release(self, images: int = 1):
+        self.in_flight -= images
+
+    def record_expired(self, images: int = 1):
+        self.expired += images
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "expired": self.expired,
+        }
@@ -0,0 +1,159 @@
+import logging
+import os
+import threading
+import time
+from typing import Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceBackend:
+    """
+    A loaded model that maps a float32 batch of shape (N, 224, 224, 3) in [0, 1]
+    to an (N, num_classes) array of class probabilities.
+    """
+
+    name = "base"
+    supports_embeddings = False
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        raise NotImplementedError
+
+    def predict_with_embeddings(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Class probabilities plus the pooled backbone features, (N, num_classes) and (N, D).
+        """
+        raise NotImplementedError(f"The {self.name} backend doesn't expose embeddings")
+
+    def warm_up(self, batch_sizes: Sequence[int], input_shape: Tuple[int, ...] = (224, 224, 3)) -> float:
+        """
+        Run a zero batch at each size so graph tracing and buffer allocation
+        happen now instead of on the first real request. Returns the seconds taken.
+        """
+        started = time.perf_counter()
+        for size in batch_sizes:
+            batch = np.zeros((size, *input_shape), dtype=np.float32)
+            self.predict(batch)
+            if self.supports_embeddings:
+                self.predict_with_embeddings(batch)
+        return time.perf_counter() - started
+
+
+class KerasBackend(InferenceBackend):
+    """
+    Keras .h5 file or SavedModel directory, run in float32.
+    """
+
+    name = "keras"
+
+    def __init__(self, model_path: str):
+        super().__init__(model_path)
+        import tensorflow as tf
+
+        self.model = tf.keras.models.load_model(model_path)
+
+        # Second model sharing the same weights that also returns the GlobalAveragePooling2D
+        # output, the feature vector the classifier head is computed from
+        pooling = next(
+            (layer for layer in self.model.layers if isinstance(layer, tf.keras.layers.GlobalAveragePooling2D)),
+            None,
+        )
+        self.embedding_model = None
+        if pooling is not None:
+            self.embedding_model = tf.keras.Model(self.model.inputs, [self.model.outputs[0], pooling.output])
+        self.supports_embeddings = self.embedding_model is not None
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        # Calling the model directly skips predict()'s per-call dataset setup and is thread-safe
+        return np.asarray(self.model(batch, training=False))
+
+    def predict_with_embeddings(self, batch: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.embedding_model is None:
+            return super().predict_with_embeddings(batch)
+        predictions, embeddings = self.embedding_model(batch, training=False)
+        return np.asarray(predictions), np.asarray(embeddings)
+
+
+class TFLiteBackend(InferenceBackend):
+    """
+    TFLite flatbuffer, float32 or quantized (dynamic-range or int8).
+
+    Interpreters aren't thread-safe, so each thread gets its own. Quantized
+    inputs/outputs are converted using the tensor's scale and zero point.
+    """
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: int = 0):
+        super().__init__(model_path)
+        import tensorflow as tf
+
+        self._interpreter_class = tf.lite.Interpreter
+        self.num_threads = num_threads or None
+        self._local = threading.local()
+        # Load once up front so a bad file fails at startup
+        self._interpreter()
+
+    def _interpreter(self):
+        interpreter = getattr(self._local, "interpreter", None)
+        if interpreter is None:
+            interpreter = self._interpreter_class(model_path=self.model_path, num_threads=self.num_threads)
+            interpreter.allocate_tensors()
+            self._local.interpreter = interpreter
+            self._local.batch_size = interpreter.get_input_details()[0]["shape"][0]
+        return interpreter
+
+    def predict(self, batch: np.ndarray) -> np.ndarray:
+        interpreter = self._interpreter()
+        input_detail = interpreter.get_input_details()[0]
+        if self._local.batch_size != len(batch):
+            interpreter.resize_tensor_input(input_detail["index"], [len(batch), *batch.shape[1:]])
+            interpreter.allocate_tensors()
+            self._local.batch_size = len(batch)
+            input_detail = interpreter.get_input_details()[0]
+
+        if input_detail["dtype"] in (np.int8, np.uint8):
+            scale, zero_point = input_detail["quantization"]
+            batch = np.round(batch / scale + zero_point)
+            info = np.iinfo(input_detail["dtype"])
+            batch = np.clip(batch, info.min, info.max)
+        interpreter.set_tensor(input_detail["index"], batch.astype(input_detail["dtype"]))
+        interpreter.invoke()
+
+        output_detail = interpreter.get_output_details()[0]
+        output = interpreter.get_tensor(output_detail["index"])
+        if output_detail["dtype"] in (np.int8, np.uint8):
+            scale, zero_point = output_detail["quantization"]
+            output = (output.astype(np.float32) - zero_point) * scale
+        return output
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+}
+
+
+def load_backend(model_path: str, kind: str = "auto", num_threads: int = 0) -> InferenceBackend:
+    """
+    Load a model with the requested backend. "auto" picks TFLite for .tflite
+    files and Keras for .h5 files and SavedModel directories.
+    """
+    if kind == "auto":
+        kind = "tflite" if model_path.endswith(".tflite") else "keras"
+    if kind not in BACKENDS:
+        raise ValueError(f"Unknown model backend: {kind}")
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found: {model_path}")
+
+    if kind == "tflite":
+        backend = TFLiteBackend(model_path, num_threads=num_threads)
+    else:
+        backend = KerasBackend(model_path)
+    logger.info(f"Loaded {model_path} with the {backend.name} backend")
+    return backend
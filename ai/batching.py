@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, List, Optional, Set, Tuple
+
+import numpy as np
+
+from admission import DeadlineExceeded, ModelStopped, check_deadline
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Groups concurrent single-image requests into batched forward passes.
+
+    The first request opens a batch; the batch is run as soon as it holds
+    `max_batch_size` images or `max_wait_ms` has passed, whichever comes first.
+    Each caller gets back its own row of the batch output. Up to
+    `max_concurrent_batches` batches run at once (one per inference worker);
+    while all are busy, new requests keep filling the next batch.
+
+    `predict_fn` may also return a tuple of arrays (e.g. predictions and
+    embeddings); each caller then gets a tuple of its rows.
+
+    Images whose deadline has passed by the time their batch runs are dropped
+    and their callers get DeadlineExceeded. stop() lets running batches finish
+    (up to `timeout`) and fails everything still queued with ModelStopped.
+    """
+
+    def __init__(
+        self,
+        predict_fn: Callable[[np.ndarray], Awaitable[np.ndarray]],
+        max_batch_size: int = 16,
+        max_wait_ms: float = 10.0,
+        input_shape: Tuple[int, ...] = (224, 224, 3),
+        max_concurrent_batches: int = 1,
+    ):
+        self.predict_fn = predict_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.input_shape = input_shape
+        self.max_concurrent_batches = max(1, max_concurrent_batches)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+        self._collecting: List[tuple] = []  # Items of the batch being filled
+        self._in_flight: Set[asyncio.Task] = set()
+        self._stopped = False
+        self.batches_run = 0
+        self.images_run = 0
+        self.images_expired = 0
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(self.max_concurrent_batches)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        self._stopped = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+        # Nothing will run what is queued or half-collected any more
+        error = ModelStopped("Model was stopped before this image ran; retry")
+        pending = self._collecting
+        self._collecting = []
+        while self._queue is not None and not self._queue.empty():
+            pending.append(self._queue.get_nowait())
+        for _, future, _ in pending:
+            if not future.done():
+                future.set_exception(error)
+
+        # Batches already on a worker get a chance to finish; _execute fails their callers if cancelled
+        if self._in_flight:
+            _, unfinished = await asyncio.wait(set(self._in_flight), timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            if unfinished:
+                await asyncio.wait(unfinished)
+
+    async def submit(self, image: np.ndarray, deadline: Optional[float] = None) -> np.ndarray:
+        """
+        Queue one preprocessed image and wait for its prediction row.
+        `deadline` is a time.monotonic() value after which the image isn't run.
+        """
+        if self._stopped:
+            raise ModelStopped("Model is stopped; retry")
+        if image.shape != self.input_shape:
+            # A mis-shaped image would make np.stack fail for the whole batch
+            raise ValueError(f"Expected image of shape {self.input_shape}, got {image.shape}")
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((image, future, deadline))
+        return await future
+
+    async def _collect(self) -> List[tuple]:
+        # Kept on the instance so stop() can fail a half-collected batch
+        self._collecting = items = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(items) < self.max_batch_size:
+            # Take whatever is already queued without waiting
+            try:
+                items.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                items.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        self._collecting = []
+        return items
+
+    async def _run(self):
+        while True:
+            # Wait for a free worker before opening the next batch
+            await self._slots.acquire()
+            try:
+                items = await self._collect()
+            except BaseException:
+                self._slots.release()
+                raise
+            # Keep a reference so the task can't be garbage-collected mid-batch
+            task = asyncio.create_task(self._execute(items))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+
+    async def _execute(self, items: List[tuple]):
+        try:
+            # Skip callers that gave up while waiting, and fail the ones past their deadline
+            live = []
+            for image, future, deadline in items:
+                if future.done():
+                    continue
+                try:
+                    check_deadline(deadline)
+                except DeadlineExceeded as e:
+                    self.images_expired += 1
+                    future.set_exception(e)
+                    continue
+                live.append((image, future))
+            items = live
+            if not items:
+                return
+
+            batch = np.stack([image for image, _ in items])
+            try:
+                outputs = await self.predict_fn(batch)
+            except asyncio.CancelledError:
+                # Cancelled by stop(): callers must not be left waiting forever
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(ModelStopped("Model was stopped while this image was running; retry"))
+                raise
+            except Exception as e:
+                logger.error(f"Batch prediction failed for {len(items)} images: {e}")
+                for _, future in items:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+
+            self.batches_run += 1
+            self.images_run += len(items)
+            rows = zip(*outputs) if isinstance(outputs, tuple) else outputs
+            for (_, future), row in zip(items, rows):
+                if not future.done():
+                    future.set_result(row)
+        finally:
+            self._slots.release()
+
+    def stats(self) -> dict:
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000.0,
+            "max_concurrent_batches": self.max_concurrent_batches,
+            "queued": self._queue.qsize() if self._queue else 0,
+            "batches_in_flight": len(self._in_flight),
+            "batches_run": self.batches_run,
+            "images_run": self.images_run,
+            "images_expired": self.images_expired,
+            "avg_batch_size": self.images_run / self.batches_run if self.batches_run else 0.0,
+        }
@@ -0,0 +1,228 @@
+"""
+Build the training dataset as sharded TFRecords.
+
+Reads one or more class-per-subdirectory image trees (e.g. dataset/train and
+dataset/validation), drops duplicate files by content hash, makes a stratified
+train/validation split, and writes pre-resized 224x224 images into TFRecord
+shards plus a manifest.json with per-class and per-shard counts and a SHA-256
+per shard file.
+
+    python build_dataset.py dataset/train dataset/validation --out dataset_tfrecords
+    python training.py --data dataset_tfrecords
+
+Large sequential shard files read much faster than thousands of small JPEGs,
+especially from network storage, and the resize is done once here rather
+than every epoch.
+"""
+import argparse
+import json
+import os
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import tensorflow as tf
+
+from feature_cache import file_hash
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".ppm", ".tif", ".tiff")  # As training.py
+IMG_SIZE = (224, 224)
+MANIFEST = "manifest.json"
+
+FEATURES = {
+    "image": tf.io.FixedLenFeature([], tf.string),
+    "label": tf.io.FixedLenFeature([], tf.int64),
+    "sha256": tf.io.FixedLenFeature([], tf.string),
+}
+
+
+def collect(sources):
+    """
+    Unique images across all source trees: {sha256: (path, class name)}.
+    A file seen again under the same class is a duplicate; under a different
+    class it is a conflict, and the first label wins.
+    """
+    images = {}
+    duplicates = 0
+    conflicts = []
+    for source in sources:
+        for class_name in sorted(os.listdir(source)):
+            class_dir = os.path.join(source, class_name)
+            if not os.path.isdir(class_dir):
+                continue
+            for name in sorted(os.listdir(class_dir)):
+                if not name.lower().endswith(IMAGE_EXTENSIONS):
+                    continue
+                path = os.path.join(class_dir, name)
+                digest = file_hash(path)
+                if digest not in images:
+                    images[digest] = (path, class_name)
+                elif images[digest][1] == class_name:
+                    duplicates += 1
+                else:
+                    conflicts.append({"sha256": digest, "kept": images[digest][0], "dropped": path})
+    return images, duplicates, conflicts
+
+
+def stratified_split(images, classes, validation_fraction: float, seed: int):
+    """
+    Split each class separately so both splits keep the class balance.
+    Returns (train, validation) lists of (sha256, path, label), shuffled.
+    """
+    by_class = defaultdict(list)
+    for digest, (path, class_name) in sorted(images.items()):
+        by_class[class_name].append((digest, path, classes.index(class_name)))
+
+    rng = random.Random(seed)
+    train, validation = [], []
+    for class_name in classes:
+        items = by_class[class_name]
+        rng.shuffle(items)
+        n_validation = round(len(items) * validation_fraction)
+        if len(items) > 1:
+            n_validation = min(max(n_validation, 1), len(items) - 1)
+        validation.extend(items[:n_validation])
+        train.extend(items[n_validation:])
+    # Shards are read sequentially, so mix the classes up front
+    rng.shuffle(train)
+    rng.shuffle(validation)
+    return train, validation
+
+
+def encode_image(path: str, quality: int) -> bytes:
+    """
+    Decode, resize to IMG_SIZE (nearest-neighbour, as training always did) and re-encode as JPEG.
+    """
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.cast(tf.image.resize(image, IMG_SIZE, method="nearest"), tf.uint8)
+    return tf.io.encode_jpeg(image, quality=quality).numpy()
+
+
+def write_split(items, split: str, out_dir: str, shard_size: int, quality: int, classes):
+    """
+    Write one split's shards. Returns the manifest entries for its shards and
+    the paths that could not be decoded.
+    """
+    num_shards = max(1, -(-len(items) // shard_size))
+    shards = []
+    unreadable = []
+    for shard_index in range(num_shards):
+        name = f"{split}-{shard_index:05d}-of-{num_shards:05d}.tfrecord"
+        path = os.path.join(out_dir, name)
+        class_counts = Counter()
+        with tf.io.TFRecordWriter(path) as writer:
+            for digest, image_path, label in items[shard_index * shard_size:(shard_index + 1) * shard_size]:
+                try:
+                    encoded = encode_image(image_path, quality)
+                except Exception as e:
+                    print(f"Skipping unreadable image {image_path}: {e}")
+                    unreadable.append(image_path)
+                    continue
+                example = tf.train.Example(features=tf.train.Features(feature={
+                    "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[encoded])),
+                    "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[label])),
+                    "sha256": tf.train.Feature(bytes_list=tf.train.BytesList(value=[digest.encode()])),
+                }))
+                writer.write(example.SerializeToString())
+                class_counts[classes[label]] += 1
+        shards.append({
+            "file": name,
+            "count": sum(class_counts.values()),
+            "class_counts": {c: class_counts[c] for c in classes},
+            "sha256": file_hash(path),
+        })
+        print(f"Wrote {name}: {shards[-1]['count']} images")
+    return shards, unreadable
+
+
+def build(sources, out_dir: str, validation_fraction: float, shard_size: int, quality: int, seed: int) -> dict:
+    os.makedirs(out_dir, exist_ok=True)
+    images, duplicates, conflicts = collect(sources)
+    classes = sorted({class_name for _, class_name in images.values()})
+    train, validation = stratified_split(images, classes, validation_fraction, seed)
+    print(f"{len(images)} unique images in {len(classes)} classes; "
+          f"{duplicates} duplicates and {len(conflicts)} cross-class conflicts dropped")
+
+    manifest = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "sources": list(sources),
+        "classes": classes,
+        "image_size": list(IMG_SIZE),
+        "encoding": "jpeg",
+        "jpeg_quality": quality,
+        "seed": seed,
+        "validation_fraction": validation_fraction,
+        "duplicates_dropped": duplicates,
+        "conflicts": conflicts,
+        "splits": {},
+    }
+    for split, items in (("train", train), ("validation", validation)):
+        shards, unreadable = write_split(items, split, out_dir, shard_size, quality, classes)
+        manifest["splits"][split] = {
+            "count": sum(shard["count"] for shard in shards),
+            "class_counts": {c: sum(shard["class_counts"][c] for shard in shards) for c in classes},
+            "unreadable": unreadable,
+            "shards": shards,
+        }
+
+    with open(os.path.join(out_dir, MANIFEST), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def read_manifest(data_dir: str) -> dict:
+    with open(os.path.join(data_dir, MANIFEST)) as f:
+        return json.load(f)
+
+
+def is_tfrecord_dataset(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def load_split(data_dir: str, split: str, shuffle_shards: bool = False) -> tf.data.Dataset:
+    """
+    Stream one split as (uint8 224x224x3 image, label) pairs. Shards are read
+    sequentially, a few at a time in parallel; with `shuffle_shards` their
+    order changes every epoch.
+    """
+    manifest = read_manifest(data_dir)
+    files = [os.path.join(data_dir, shard["file"]) for shard in manifest["splits"][split]["shards"]]
+    dataset = tf.data.Dataset.from_tensor_slices(files)
+    if shuffle_shards:
+        dataset = dataset.shuffle(len(files), reshuffle_each_iteration=True)
+    dataset = dataset.interleave(
+        tf.data.TFRecordDataset,
+        cycle_length=min(len(files), 4),
+        num_parallel_calls=tf.data.AUTOTUNE,
+        deterministic=not shuffle_shards,
+    )
+
+    def parse(record):
+        example = tf.io.parse_single_example(record, FEATURES)
+        image = tf.io.decode_jpeg(example["image"], channels=3)
+        image = tf.ensure_shape(image, (*manifest["image_size"], 3))
+        return image, example["label"]
+
+    return dataset.map(parse, num_parallel_calls=tf.data.AUTOTUNE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a deduplicated, sharded TFRecord dataset.")
+    parser.add_argument("sources", nargs="*", default=["dataset/train", "dataset/validation"],
+                        help="class-per-subdirectory image trees to merge")
+    parser.add_argument("--out", default="dataset_tfrecords")
+    parser.add_argument("--validation-fraction", type=float, default=0.2)
+    parser.add_argument("--shard-size", type=int, default=1000, help="images per shard")
+    parser.add_argument("--quality", type=int, default=95, help="JPEG quality of the stored images")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    manifest = build(args.sources, args.out, args.validation_fraction, args.shard_size, args.quality, args.seed)
+    for split, info in manifest["splits"].items():
+        counts = ", ".join(f"{c}={n}" for c, n in info["class_counts"].items())
+        print(f"{split}: {info['count']} images in {len(info['shards'])} shards ({counts})")
+    print(f"Wrote {os.path.join(args.out, MANIFEST)}")
+
+
+if __name__ == "__main__":
+    main()
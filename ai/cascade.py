@@ -0,0 +1,56 @@
+from typing import Optional
+
+import numpy as np
+
+from inference_pool import InferencePool
+
+
+def escalation_indices(first_stage_predictions: np.ndarray, threshold: float) -> np.ndarray:
+    """
+    Indices of the rows whose top first-stage probability is below `threshold`
+    and so need the second stage.
+    """
+    return np.flatnonzero(first_stage_predictions.max(axis=1) < threshold)
+
+
+class CascadePredictor:
+    """
+    Two-stage classifier: a small model sees every image, and only the images
+    it isn't confident about (top probability below `threshold`) go on to the
+    full model. Both models must output the same classes in the same order.
+    """
+
+    def __init__(self, first_stage: InferencePool, second_stage: InferencePool, threshold: float):
+        self.first_stage = first_stage
+        self.second_stage = second_stage
+        self.threshold = threshold
+        self.images = 0
+        self.escalated = 0
+        self.batches = 0
+        self.batches_escalated = 0
+
+    async def predict(self, batch: np.ndarray, deadline: Optional[float] = None) -> np.ndarray:
+        predictions = await self.first_stage.predict(batch, deadline)
+        escalate = escalation_indices(predictions, self.threshold)
+
+        self.images += len(batch)
+        self.batches += 1
+        if len(escalate):
+            self.escalated += len(escalate)
+            self.batches_escalated += 1
+            # The first stage already ran, so finish the batch even if the deadline has passed
+            predictions = np.array(predictions, dtype=np.float32)
+            predictions[escalate] = await self.second_stage.predict(batch[escalate])
+        return predictions
+
+    def stats(self) -> dict:
+        return {
+            "threshold": self.threshold,
+            "first_stage_model": self.first_stage.model_path,
+            "second_stage_model": self.second_stage.model_path,
+            "images": self.images,
+            "escalated": self.escalated,
+            "escalation_fraction": self.escalated / self.images if self.images else 0.0,
+            "batches_escalated": self.batches_escalated,
+            "batches": self.batches,
+        }
@@ -0,0 +1,69 @@
+import os
+
+# Model file (.h5, SavedModel directory or .tflite) loaded at startup and the version reported
+# for it. The version defaults to the file name without extension. Other versions can be loaded
+# at runtime through POST /models/load. A distilled student
+# (`training.py --distill-from`) is served by pointing MODEL_PATH at it
+MODEL_PATH = os.getenv("MODEL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "civic_mirror_model.h5"))
+MODEL_VERSION = os.getenv("MODEL_VERSION") or None
+
+# Cascade mode: when CASCADE_MODEL_PATH is set (e.g. the MobileNet model from
+# `training.py --arch mobilenet_v2`), that model classifies every image first and only images
+# whose top probability is below CASCADE_THRESHOLD go on to the full model
+CASCADE_MODEL_PATH = os.getenv("CASCADE_MODEL_PATH", "")
+CASCADE_THRESHOLD = float(os.getenv("CASCADE_THRESHOLD", "0.85"))
+
+# Embeddings returned with ?include_embedding=true: the backbone's pooled features, randomly
+# projected down to EMBEDDING_DIM (0 keeps all 2048) and L2-normalized. Keep the seed fixed so
+# stored embeddings stay comparable. Embeddings come from the full model, so in cascade mode
+# requests that ask for one skip the first stage and get none of the cascade's savings; only
+# turn them on in the backend (ML_REQUEST_EMBEDDINGS) when that cost is acceptable
+EMBEDDING_DIM = int(os.getenv("EMBEDDING_DIM", "256"))
+EMBEDDING_SEED = int(os.getenv("EMBEDDING_SEED", "0"))
+
+# After a hot reload the replaced version gets this long to finish in-flight requests
+MODEL_DRAIN_TIMEOUT_SECONDS = float(os.getenv("MODEL_DRAIN_TIMEOUT_SECONDS", "30"))
+
+# POST /models/load only loads models inside MODEL_DIR (relative paths are resolved against it),
+# since a Keras file can run arbitrary code when deserialized. /models/load and /models/traffic
+# require `Authorization: Bearer <MODEL_ADMIN_TOKEN>` and are disabled while it is unset
+MODEL_DIR = os.path.realpath(os.getenv("MODEL_DIR", os.path.dirname(os.path.abspath(MODEL_PATH))))
+MODEL_ADMIN_TOKEN = os.getenv("MODEL_ADMIN_TOKEN", "")
+
+# Inference backend: "keras" (.h5 / SavedModel), "tflite" (float or quantized .tflite from
+# export_model.py) or "auto" to pick by file extension
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "auto")
+
+# Micro-batching: concurrent /predict/ requests are grouped into one forward pass of up to
+# MAX_BATCH_SIZE images, waiting at most MAX_BATCH_WAIT_MS for the batch to fill
+MAX_BATCH_SIZE = int(os.getenv("MAX_BATCH_SIZE", "16"))
+MAX_BATCH_WAIT_MS = float(os.getenv("MAX_BATCH_WAIT_MS", "10"))
+
+# Inference runs on a dedicated executor. INFERENCE_MODE is "thread" (one shared model) or
+# "process" (each of INFERENCE_WORKERS processes loads its own copy). TF thread counts of 0
+# split the cores evenly between worker processes; in thread mode TF's pools are shared by all
+# threads and keep TF's defaults, and the per-worker share only sizes TFLite interpreters
+INFERENCE_MODE = os.getenv("INFERENCE_MODE", "thread")
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+TF_INTRA_OP_THREADS = int(os.getenv("TF_INTRA_OP_THREADS", "0"))
+TF_INTER_OP_THREADS = int(os.getenv("TF_INTER_OP_THREADS", "0"))
+
+# /predict/batch: most images accepted per call, and how many go through the model per chunk
+MAX_BATCH_REQUEST_IMAGES = int(os.getenv("MAX_BATCH_REQUEST_IMAGES", "256"))
+BATCH_REQUEST_CHUNK_SIZE = int(os.getenv("BATCH_REQUEST_CHUNK_SIZE", "32"))
+
+# Admission control: at most MAX_IN_FLIGHT_IMAGES images are decoding, queued or running at once
+# (keep it >= MAX_BATCH_REQUEST_IMAGES); past that requests get 429 with Retry-After. Work still
+# queued REQUEST_DEADLINE_MS after the request arrived is dropped without running (0 disables)
+MAX_IN_FLIGHT_IMAGES = int(os.getenv("MAX_IN_FLIGHT_IMAGES", "256"))
+REQUEST_DEADLINE_MS = float(os.getenv("REQUEST_DEADLINE_MS", "5000"))
+RETRY_AFTER_SECONDS = int(os.getenv("RETRY_AFTER_SECONDS", "1"))
+
+# Batch sizes run through every inference worker at startup so the first real requests don't pay
+# for graph tracing. Comma-separated; empty means every size up to MAX_BATCH_SIZE plus
+# BATCH_REQUEST_CHUNK_SIZE
+WARMUP_BATCH_SIZES = sorted({
+    int(size) for size in os.getenv("WARMUP_BATCH_SIZES", "").split(",") if size.strip()
+} or {*range(1, MAX_BATCH_SIZE + 1), BATCH_REQUEST_CHUNK_SIZE})
+# A model whose workers aren't all loaded and warmed up within this long fails to load
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", "300"))
@@ -0,0 +1,64 @@
+from typing import Optional, Tuple
+
+import numpy as np
+
+from inference_pool import InferencePool
+
+
+class EmbeddingReducer:
+    """
+    Shrinks backbone features (2048-d for ResNet50) with a fixed Gaussian
+    random projection and L2-normalizes them, so cosine similarity is a dot
+    product. Random projection roughly preserves those similarities; the seed
+    keeps the projection identical across restarts and workers, so stored
+    embeddings stay comparable. A dim of 0 keeps the full vector.
+    """
+
+    def __init__(self, dim: int = 256, seed: int = 0):
+        self.dim = dim
+        self.seed = seed
+        self._projection: Optional[np.ndarray] = None
+
+    def _projection_for(self, input_dim: int) -> np.ndarray:
+        if self._projection is None or self._projection.shape[0] != input_dim:
+            rng = np.random.default_rng(self.seed)
+            self._projection = (rng.standard_normal((input_dim, self.dim)) / np.sqrt(self.dim)).astype(np.float32)
+        return self._projection
+
+    def reduce(self, embeddings: np.ndarray) -> np.ndarray:
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if 0 < self.dim < embeddings.shape[1]:
+            embeddings = embeddings @ self._projection_for(embeddings.shape[1])
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.maximum(norms, 1e-12)
+
+
+class EmbeddingPredictor:
+    """
+    Runs the full model with its pooled features exposed, returning
+    (predictions, reduced embeddings). Embeddings always come from the full
+    model, even in cascade mode, so every stored vector is in the same space.
+    Callers check `supported` first: backends without pooled features (TFLite,
+    Keras models without a GlobalAveragePooling2D layer) can't produce them.
+    """
+
+    def __init__(self, pool: InferencePool, reducer: EmbeddingReducer):
+        self.pool = pool
+        self.reducer = reducer
+        self.images = 0
+
+    @property
+    def supported(self) -> bool:
+        return self.pool.supports_embeddings
+
+    async def predict(self, batch: np.ndarray, deadline: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        predictions, embeddings = await self.pool.predict_with_embeddings(batch, deadline)
+        self.images += len(batch)
+        return predictions, self.reducer.reduce(embeddings)
+
+    def stats(self) -> dict:
+        return {
+            "supported": self.supported,
+            "dim": self.reducer.dim,
+            "images": self.images,
+        }
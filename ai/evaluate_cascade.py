@@ -0,0 +1,85 @@
+"""
+Pick a cascade threshold on the validation set.
+
+Runs the small first-stage model and the full model over every validation
+image, then for each threshold reports the cascade's accuracy, the fraction of
+images escalated to the full model and the average inference cost per image
+relative to running the full model alone.
+
+    python evaluate_cascade.py --first-stage civic_mirror_mobilenet.h5 \
+        --model civic_mirror_model.h5 --validation-dir dataset/validation
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backends import load_backend
+from cascade import escalation_indices
+from export_model import load_validation_set
+
+
+def timed_predict(backend, images: np.ndarray, batch_size: int):
+    """
+    Predictions for all images and the average seconds per image.
+    """
+    backend.predict(images[:batch_size])  # Warm-up
+    outputs = []
+    started = time.perf_counter()
+    for start in range(0, len(images), batch_size):
+        outputs.append(backend.predict(images[start:start + batch_size]))
+    return np.concatenate(outputs), (time.perf_counter() - started) / len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare cascade thresholds on the validation set.")
+    parser.add_argument("--first-stage", required=True, help="small model, e.g. civic_mirror_mobilenet.h5")
+    parser.add_argument("--model", default="civic_mirror_model.h5", help="full model")
+    parser.add_argument("--validation-dir", default="dataset/validation",
+                        help="image tree, or a TFRecord dataset directory from build_dataset.py")
+    parser.add_argument("--thresholds", default="0.5,0.6,0.7,0.8,0.85,0.9,0.95,0.99")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--report", default="cascade_report.json")
+    args = parser.parse_args()
+
+    images, labels, classes = load_validation_set(args.validation_dir)
+    print(f"Evaluating on {len(images)} validation images ({', '.join(classes)})")
+
+    small, small_seconds = timed_predict(load_backend(args.first_stage), images, args.batch_size)
+    full, full_seconds = timed_predict(load_backend(args.model), images, args.batch_size)
+    full_accuracy = float(np.mean(np.argmax(full, axis=1) == labels))
+
+    rows = []
+    for threshold in (float(t) for t in args.thresholds.split(",")):
+        escalate = escalation_indices(small, threshold)
+        predictions = small.copy()
+        predictions[escalate] = full[escalate]
+        fraction = len(escalate) / len(images)
+        rows.append({
+            "threshold": threshold,
+            "accuracy": float(np.mean(np.argmax(predictions, axis=1) == labels)),
+            "escalation_fraction": fraction,
+            # Every image pays for the small model, escalated ones for the full model too
+            "relative_cost": (small_seconds + fraction * full_seconds) / full_seconds,
+        })
+
+    print(f"\nfull model: accuracy {full_accuracy:.3f}, {full_seconds * 1000:.1f} ms/image; "
+          f"first stage: {small_seconds * 1000:.1f} ms/image")
+    print(f"{'threshold':>10}{'accuracy':>10}{'escalated':>11}{'cost':>8}")
+    for row in rows:
+        print(f"{row['threshold']:>10.2f}{row['accuracy']:>10.3f}"
+              f"{row['escalation_fraction']:>11.1%}{row['relative_cost']:>8.2f}")
+
+    with open(args.report, "w") as f:
+        json.dump({
+            "full_model_accuracy": full_accuracy,
+            "full_model_ms_per_image": full_seconds * 1000,
+            "first_stage_ms_per_image": small_seconds * 1000,
+            "thresholds": rows,
+        }, f, indent=2)
+    print(f"\nWrote {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""
+Export the trained Keras model for serving and compare the exported variants.
+
+Writes a SavedModel and TFLite flatbuffers (float32, dynamic-range and int8
+quantized), then evaluates each on the validation set: accuracy, and p50/p99
+latency for single images and for batches. The comparison is printed and
+saved as export_report.json next to the exported models.
+
+    python export_model.py --model civic_mirror_model.h5 --out exported \
+        --calibration-dir dataset/train --validation-dir dataset/validation
+
+--validation-dir may also be a TFRecord dataset built by build_dataset.py.
+
+Serve a variant with e.g. MODEL_PATH=exported/civic_mirror_model_int8.tflite.
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+import numpy as np
+import tensorflow as tf
+
+from backends import load_backend
+from build_dataset import is_tfrecord_dataset, load_split, read_manifest
+from preprocessing import normalize, preprocess
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".webp")
+
+
+def list_images(directory: str):
+    """
+    (path, class_index) pairs for a class-per-subdirectory tree, with classes in
+    alphabetical order like flow_from_directory.
+    """
+    classes = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    items = []
+    for class_index, class_name in enumerate(classes):
+        class_dir = os.path.join(directory, class_name)
+        for name in sorted(os.listdir(class_dir)):
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                items.append((os.path.join(class_dir, name), class_index))
+    return items, classes
+
+
+def read_image(path: str) -> np.ndarray:
+    with open(path, "rb") as f:
+        return preprocess(f.read())
+
+
+def load_validation_set(path: str):
+    """
+    (images, labels, classes) for either a class-per-subdirectory tree or the
+    validation split of a TFRecord dataset from build_dataset.py.
+    """
+    if is_tfrecord_dataset(path):
+        images, labels = [], []
+        for image, label in load_split(path, "validation").as_numpy_iterator():
+            images.append(normalize(image))
+            labels.append(label)
+        return np.stack(images), np.array(labels), read_manifest(path)["classes"]
+    items, classes = list_images(path)
+    images = np.stack([read_image(image_path) for image_path, _ in items])
+    return images, np.array([label for _, label in items]), classes
+
+
+def representative_dataset(calibration_dir: str, samples: int):
+    items, _ = list_images(calibration_dir)
+    random.Random(0).shuffle(items)
+
+    def generator():
+        for path, _ in items[:samples]:
+            yield [read_image(path)[np.newaxis, ...]]
+
+    return generator
+
+
+def export(model_path: str, out_dir: str, quantizations, calibration_dir: str, calibration_samples: int):
+    """
+    Export the model; returns {variant name: exported path}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    model = tf.keras.models.load_model(model_path)
+    base = os.path.splitext(os.path.basename(model_path))[0]
+    exported = {"keras": model_path}
+
+    saved_model_dir = os.path.join(out_dir, f"{base}_savedmodel")
+    tf.saved_model.save(model, saved_model_dir)
+    exported["savedmodel"] = saved_model_dir
+    print(f"Wrote {saved_model_dir}")
+
+    for quantization in quantizations:
+        converter = tf.lite.TFLiteConverter.from_keras_model(model)
+        if quantization == "dynamic":
+            # Weights stored as int8, activations stay float
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        elif quantization == "int8":
+            # Weights and activations int8, calibrated on sample images
+            if not calibration_dir:
+                print("Skipping int8: --calibration-dir is required")
+                continue
+            converter.optimizations = [tf.lite.Optimize.DEFAULT]
+            converter.representative_dataset = representative_dataset(calibration_dir, calibration_samples)
+            converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+        elif quantization != "float32":
+            raise ValueError(f"Unknown quantization: {quantization}")
+
+        path = os.path.join(out_dir, f"{base}_{quantization}.tflite")
+        with open(path, "wb") as f:
+            f.write(converter.convert())
+        exported[f"tflite_{quantization}"] = path
+        print(f"Wrote {path} ({os.path.getsize(path) / 1e6:.1f} MB)")
+
+    return exported
+
+
+def model_size_mb(path: str) -> float:
+    if os.path.isdir(path):
+        return sum(
+            os.path.getsize(os.path.join(root, name))
+            for root, _, names in os.walk(path) for name in names
+        ) / 1e6
+    return os.path.getsize(path) / 1e6
+
+
+def evaluate(path: str, images: np.ndarray, labels: np.ndarray, batch_size: int, latency_runs: int):
+    backend = load_backend(path)
+
+    correct = 0
+    for start in range(0, len(images), batch_size):
+        predictions = backend.predict(images[start:start + batch_size])
+        correct += int(np.sum(np.argmax(predictions, axis=1) == labels[start:start + batch_size]))
+
+    def latencies(size):
+        batch = images[:size]
+        backend.predict(batch)  # Warm-up
+        timings = []
+        for _ in range(latency_runs):
+            started = time.perf_counter()
+            backend.predict(batch)
+            timings.append((time.perf_counter() - started) * 1000)
+        return np.percentile(timings, 50), np.percentile(timings, 99)
+
+    single_p50, single_p99 = latencies(1)
+    batch_p50, batch_p99 = latencies(min(batch_size, len(images)))
+    return {
+        "path": path,
+        "backend": backend.name,
+        "size_mb": round(model_size_mb(path), 2),
+        "accuracy": correct / len(images),
+        "single_p50_ms": round(single_p50, 2),
+        "single_p99_ms": round(single_p99, 2),
+        "batch_size": min(batch_size, len(images)),
+        "batch_p50_ms": round(batch_p50, 2),
+        "batch_p99_ms": round(batch_p99, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the classifier and compare backends.")
+    parser.add_argument("--model", default="civic_mirror_model.h5")
+    parser.add_argument("--out", default="exported")
+    parser.add_argument("--quantize", default="float32,dynamic,int8",
+                        help="comma-separated TFLite variants: float32, dynamic, int8")
+    parser.add_argument("--calibration-dir", default="dataset/train")
+    parser.add_argument("--calibration-samples", type=int, default=200)
+    parser.add_argument("--validation-dir", default="dataset/validation",
+                        help="image tree, or a TFRecord dataset directory from build_dataset.py")
+    parser.add_argument("--batch-size", type=int, default=16)
+    parser.add_argument("--latency-runs", type=int, default=50)
+    args = parser.parse_args()
+
+    calibration_dir = args.calibration_dir if os.path.isdir(args.calibration_dir) else None
+    exported = export(args.model, args.out, args.quantize.split(","), calibration_dir, args.calibration_samples)
+
+    if not os.path.isdir(args.validation_dir):
+        print(f"No validation set at {args.validation_dir}, skipping the comparison report")
+        return
+
+    images, labels, classes = load_validation_set(args.validation_dir)
+    print(f"Evaluating on {len(images)} validation images ({', '.join(classes)})")
+
+    report = {name: evaluate(path, images, labels, args.batch_size, args.latency_runs)
+              for name, path in exported.items()}
+
+    print(f"\n{'variant':<16}{'size MB':>9}{'acc':>8}{'1x p50':>9}{'1x p99':>9}{'Nx p50':>9}{'Nx p99':>9}")
+    for name, row in report.items():
+        print(f"{name:<16}{row['size_mb']:>9.1f}{row['accuracy']:>8.3f}"
+              f"{row['single_p50_ms']:>9.1f}{row['single_p99_ms']:>9.1f}"
+              f"{row['batch_p50_ms']:>9.1f}{row['batch_p99_ms']:>9.1f}")
+
+    report_path = os.path.join(args.out, "export_report.json")
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+On-disk cache of frozen-backbone features, keyed by image content hash.
+
+With the backbone frozen, its output for an image never changes, so it only
+needs computing once. Features are stored as .npy shards (loaded
+memory-mapped) plus an index.json mapping each image's SHA-256 to its shard
+and row. Each run appends one shard holding only the images not seen before.
+The cache directory is named after the backbone and a hash of every setting
+that changes the features, input pipeline included, so changing any of them
+starts a fresh cache instead of reusing stale features.
+"""
+import hashlib
+import json
+import os
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class FeatureCache:
+    """
+    Features for one backbone configuration, under `directory/key-<hash>`.
+    `settings` must hold everything the features depend on (backbone,
+    weights, precision, and how images are decoded, resized and normalized);
+    it is hashed into the directory name and saved there as settings.json.
+    """
+
+    def __init__(self, directory: str, key: str, settings: Optional[Dict[str, Any]] = None):
+        settings = settings or {}
+        digest = hashlib.sha256(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+        self.directory = os.path.join(directory, f"{key}-{digest}")
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, "settings.json"), "w") as f:
+            json.dump(settings, f, indent=2, sort_keys=True)
+        self._index_path = os.path.join(self.directory, "index.json")
+        self.index: Dict[str, List] = {}  # hash -> [shard name, row]
+        if os.path.exists(self._index_path):
+            with open(self._index_path) as f:
+                self.index = json.load(f)
+        self._shards: Dict[str, np.ndarray] = {}
+
+    def missing(self, hashes: Sequence[str]) -> List[str]:
+        seen = set()
+        missing = []
+        for h in hashes:
+            if h not in self.index and h not in seen:
+                seen.add(h)
+                missing.append(h)
+        return missing
+
+    def add(self, hashes: Sequence[str], features: np.ndarray) -> None:
+        """
+        Store features for new hashes as one new shard, then update the index.
+        The index is replaced atomically, so an interrupted run never leaves
+        it pointing at a shard that wasn't fully written.
+        """
+        if not len(hashes):
+            return
+        shard = f"shard-{len(set(shard for shard, _ in self.index.values())):05d}.npy"
+        np.save(os.path.join(self.directory, shard), np.asarray(features, dtype=np.float32))
+        for row, h in enumerate(hashes):
+            self.index[h] = [shard, row]
+        tmp_path = self._index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.index, f)
+        os.replace(tmp_path, self._index_path)
+
+    def _shard(self, name: str) -> np.ndarray:
+        if name not in self._shards:
+            self._shards[name] = np.load(os.path.join(self.directory, name), mmap_mode="r")
+        return self._shards[name]
+
+    def load(self, hashes: Sequence[str]) -> np.ndarray:
+        """
+        Features for `hashes`, in order, as one in-memory array.
+        """
+        rows = [self._shard(shard)[row] for shard, row in (self.index[h] for h in hashes)]
+        return np.stack(rows).astype(np.float32)
+
+    def get_or_extract(
+        self,
+        paths: Sequence[str],
+        extract: Callable[[Sequence[str]], np.ndarray],
+        batch_size: int = 64,
+    ) -> np.ndarray:
+        """
+        Features for every path, running `extract` (paths -> features) only on
+        images whose content isn't cached yet.
+        """
+        hashes = [file_hash(path) for path in paths]
+        missing = set(self.missing(hashes))
+        if missing:
+            new_paths, new_hashes = [], []
+            for path, h in zip(paths, hashes):
+                if h in missing:
+                    new_paths.append(path)
+                    new_hashes.append(h)
+                    missing.discard(h)
+            print(f"Extracting features for {len(new_paths)} new images ({len(paths) - len(new_paths)} cached)")
+            features = np.concatenate([
+                extract(new_paths[start:start + batch_size])
+                for start in range(0, len(new_paths), batch_size)
+            ])
+            self.add(new_hashes, features)
+        else:
+            print(f"All {len(paths)} images found in the feature cache")
+        return self.load(hashes)
@@ -0,0 +1,211 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+import threading
+import time
+from typing import Optional, Sequence
+
+import numpy as np
+
+from admission import ModelStopped, check_deadline
+from backends import load_backend
+
+logger = logging.getLogger(__name__)
+
+# Backend held by each process-mode worker
+_worker_backend = None
+
+
+def configure_tf_threads(intra_op_threads: int, inter_op_threads: int):
+    """
+    Set TF's thread pools. Must run before TF executes any op in the process.
+    """
+    import tensorflow as tf
+
+    if intra_op_threads > 0:
+        tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+    if inter_op_threads > 0:
+        tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+
+
+def _init_process_worker(
+    model_path: str, backend: str, intra_op_threads: int, inter_op_threads: int, warmup_batch_sizes: Sequence[int]
+):
+    global _worker_backend
+    configure_tf_threads(intra_op_threads, inter_op_threads)
+    _worker_backend = load_backend(model_path, backend, num_threads=intra_op_threads)
+    seconds = _worker_backend.warm_up(warmup_batch_sizes)
+    logger.info(f"Inference worker {os.getpid()} loaded {model_path}, warm-up took {seconds:.2f}s")
+
+
+def _worker_pid() -> int:
+    return os.getpid()
+
+
+def _worker_supports_embeddings() -> bool:
+    return _worker_backend.supports_embeddings
+
+
+def _run_in_process_worker(method: str, batch: np.ndarray, deadline: Optional[float]):
+    check_deadline(deadline)
+    return getattr(_worker_backend, method)(batch)
+
+
+class InferencePool:
+    """
+    Runs model inference on a dedicated executor so the event loop never blocks.
+
+    thread  - one model shared by `workers` threads; TF releases the GIL inside ops
+    process - `workers` processes, each loading its own copy of the model, for
+              CPU boxes where one process can't keep all cores busy
+
+    When the thread counts are 0, the cores are split evenly between workers:
+    process workers set their own TF pools to their share. TF's pools are
+    process-wide, so in thread mode all worker threads share one and it keeps
+    TF's default unless set explicitly; the per-worker share then only sizes
+    each thread's TFLite interpreter.
+    Every worker runs a warm-up batch at each of `warmup_batch_sizes` before
+    it serves traffic; warm_up() fails if that takes longer than
+    `warmup_timeout` seconds. `supports_embeddings` is known once it has.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        backend: str = "auto",
+        mode: str = "thread",
+        workers: int = 1,
+        intra_op_threads: int = 0,
+        inter_op_threads: int = 0,
+        warmup_batch_sizes: Sequence[int] = (),
+        warmup_timeout: float = 300.0,
+    ):
+        if mode not in ("thread", "process"):
+            raise ValueError(f"Unknown inference mode: {mode}")
+        self.model_path = model_path
+        self.backend_kind = backend
+        self.mode = mode
+        self.workers = max(1, workers)
+        cores = os.cpu_count() or 1
+        self.intra_op_threads = intra_op_threads or max(1, cores // self.workers)
+        self.inter_op_threads = inter_op_threads or 1
+        # What thread mode sets process-wide: only explicit values
+        self._shared_intra_op_threads = intra_op_threads
+        self._shared_inter_op_threads = inter_op_threads
+        self.warmup_batch_sizes = tuple(warmup_batch_sizes)
+        self.warmup_timeout = warmup_timeout
+        self.backend = None
+        self.supports_embeddings = False
+        self._executor: Optional[Executor] = None
+
+    def start(self):
+        if self.mode == "process":
+            # spawn, not fork: TF's runtime doesn't survive a fork
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_process_worker,
+                initargs=(
+                    self.model_path, self.backend_kind, self.intra_op_threads, self.inter_op_threads,
+                    self.warmup_batch_sizes,
+                ),
+            )
+        else:
+            configure_tf_threads(self._shared_intra_op_threads, self._shared_inter_op_threads)
+            self.backend = load_backend(self.model_path, self.backend_kind, num_threads=self.intra_op_threads)
+            self.supports_embeddings = self.backend.supports_embeddings
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="inference")
+        if self.mode == "process":
+            threads = f"intra_op_threads={self.intra_op_threads}, inter_op_threads={self.inter_op_threads}"
+        else:
+            threads = (
+                f"tf_intra_op_threads={self._shared_intra_op_threads or 'default'}, "
+                f"tf_inter_op_threads={self._shared_inter_op_threads or 'default'}, "
+                f"tflite_threads={self.intra_op_threads}"
+            )
+        logger.info(f"Inference pool started: mode={self.mode}, workers={self.workers}, {threads}")
+
+    async def warm_up(self):
+        """
+        Bring every worker up and run its warm-up batches.
+
+        Process workers warm up in their initializer and only take tasks once
+        it has finished, so the pool is warm once every process has answered a
+        ping. The first process up can answer a whole burst while the others
+        are still loading, so keep pinging until all `workers` distinct PIDs
+        have replied. In thread mode the model is shared, but TFLite keeps an
+        interpreter per thread, so each thread runs the warm-up; a barrier makes
+        sure each call lands on a different thread.
+        """
+        if self.mode == "process":
+            await asyncio.wait_for(self._wait_for_process_workers(), self.warmup_timeout)
+            return
+        await asyncio.wait_for(self._warm_up_threads(), self.warmup_timeout)
+
+    async def _wait_for_process_workers(self):
+        loop = asyncio.get_running_loop()
+        started = time.perf_counter()
+        pids = set()
+        while len(pids) < self.workers:
+            if pids:
+                await asyncio.sleep(0.1)
+            # A burst of pings makes the executor spawn every process it hasn't yet
+            pids.update(await asyncio.gather(
+                *[loop.run_in_executor(self._executor, _worker_pid) for _ in range(self.workers)]
+            ))
+        # Every worker loaded the same model, so any one of them can answer
+        self.supports_embeddings = await loop.run_in_executor(self._executor, _worker_supports_embeddings)
+        logger.info(f"Inference workers ready: {len(pids)} processes in {time.perf_counter() - started:.2f}s")
+
+    async def _warm_up_threads(self):
+        loop = asyncio.get_running_loop()
+        barrier = threading.Barrier(self.workers)
+
+        def warm_up_thread() -> float:
+            barrier.wait()
+            return self.backend.warm_up(self.warmup_batch_sizes)
+
+        seconds = await asyncio.gather(
+            *[loop.run_in_executor(self._executor, warm_up_thread) for _ in range(self.workers)]
+        )
+        logger.info(f"Inference warm-up for batch sizes {list(self.warmup_batch_sizes)} took {max(seconds):.2f}s")
+
+    def shutdown(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def _run_in_thread(self, method: str, batch: np.ndarray, deadline: Optional[float]):
+        check_deadline(deadline)
+        return getattr(self.backend, method)(batch)
+
+    async def _run(self, method: str, batch: np.ndarray, deadline: Optional[float]):
+        executor = self._executor
+        if executor is None:
+            raise ModelStopped("Inference pool is shut down; retry")
+        loop = asyncio.get_running_loop()
+        try:
+            if self.mode == "process":
+                return await loop.run_in_executor(executor, _run_in_process_worker, method, batch, deadline)
+            return await loop.run_in_executor(executor, self._run_in_thread, method, batch, deadline)
+        except asyncio.CancelledError:
+            # shutdown() cancels work that hadn't started; that isn't the caller being cancelled
+            if self._executor is None:
+                raise ModelStopped("Inference pool was shut down before this batch ran; retry") from None
+            raise
+
+    async def predict(self, batch: np.ndarray, deadline: Optional[float] = None) -> np.ndarray:
+        """
+        Run a batch on the next free worker. If `deadline` (time.monotonic())
+        has passed by the time a worker picks the batch up, it raises
+        DeadlineExceeded without running the model.
+        """
+        return await self._run("predict", batch, deadline)
+
+    async def predict_with_embeddings(self, batch: np.ndarray, deadline: Optional[float] = None):
+        """
+        Like predict(), but returns (predictions, embeddings).
+        """
+        return await self._run("predict_with_embeddings", batch, deadline)
@@ -1,14 +1,47 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, Header, HTTPException, Request
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
+from typing import List, Optional
 import base64
-from io import BytesIO
-from PIL import Image
+import asyncio
+import logging
+import os
+import secrets
 import numpy as np
-import tensorflow as tf
+from admission import AdmissionController, DeadlineExceeded, ModelStopped, deadline_after
+from batching import MicroBatcher
+from cascade import CascadePredictor
+from embeddings import EmbeddingPredictor, EmbeddingReducer
+from inference_pool import InferencePool
+from model_registry import LoadInProgress, ModelRegistry, ModelVersion
+from preprocessing import load_image, preprocess, preprocess_batch, timings
+from config import (
+    MODEL_PATH,
+    MODEL_VERSION,
+    MODEL_BACKEND,
+    MAX_BATCH_SIZE,
+    MAX_BATCH_WAIT_MS,
+    INFERENCE_MODE,
+    INFERENCE_WORKERS,
+    TF_INTRA_OP_THREADS,
+    TF_INTER_OP_THREADS,
+    MAX_BATCH_REQUEST_IMAGES,
+    BATCH_REQUEST_CHUNK_SIZE,
+    WARMUP_BATCH_SIZES,
+    WARMUP_TIMEOUT_SECONDS,
+    MAX_IN_FLIGHT_IMAGES,
+    REQUEST_DEADLINE_MS,
+    RETRY_AFTER_SECONDS,
+    MODEL_DRAIN_TIMEOUT_SECONDS,
+    MODEL_DIR,
+    MODEL_ADMIN_TOKEN,
+    CASCADE_MODEL_PATH,
+    CASCADE_THRESHOLD,
+    EMBEDDING_DIM,
+    EMBEDDING_SEED,
+)
 
-# Load the trained model
-model = tf.keras.models.load_model(r'c:\Users\sayam\OneDrive\Desktop\Ml_ai_deployable\app\civic_mirror_model.h5')
+logger = logging.getLogger(__name__)
 
 # Define the class labels
 class_labels = ['garbage', 'pothole', 'streetlight', 'water_leak']
@@ -16,39 +49,375 @@ class_labels = ['garbage', 'pothole', 'streetlight', 'water_leak']
 # Initialize FastAPI app
 app = FastAPI()
 
+
+def build_pool(model_path: str) -> InferencePool:
+    # Runs the model off the event loop
+    return InferencePool(
+        model_path,
+        backend=MODEL_BACKEND,
+        mode=INFERENCE_MODE,
+        workers=INFERENCE_WORKERS,
+        intra_op_threads=TF_INTRA_OP_THREADS,
+        inter_op_threads=TF_INTER_OP_THREADS,
+        warmup_batch_sizes=WARMUP_BATCH_SIZES,
+        warmup_timeout=WARMUP_TIMEOUT_SECONDS,
+    )
+
+
+def build_model(model_path: str, version: str) -> ModelVersion:
+    pool = build_pool(model_path)
+
+    # In cascade mode the small model sees every batch and only unsure images reach this one
+    cascade = None
+    if CASCADE_MODEL_PATH:
+        cascade = CascadePredictor(build_pool(CASCADE_MODEL_PATH), pool, CASCADE_THRESHOLD)
+
+    # Groups concurrent requests into one forward pass, one batch in flight per worker
+    def build_batcher(predict_fn) -> MicroBatcher:
+        return MicroBatcher(
+            predict_fn,
+            max_batch_size=MAX_BATCH_SIZE,
+            max_wait_ms=MAX_BATCH_WAIT_MS,
+            max_concurrent_batches=INFERENCE_WORKERS,
+        )
+
+    embedder = EmbeddingPredictor(pool, EmbeddingReducer(EMBEDDING_DIM, EMBEDDING_SEED))
+    return ModelVersion(
+        version,
+        model_path,
+        pool,
+        build_batcher(cascade.predict if cascade else pool.predict),
+        cascade=cascade,
+        embedder=embedder,
+        embed_batcher=build_batcher(embedder.predict),
+    )
+
+
+# Loaded model versions and the traffic split between them
+registry = ModelRegistry(build_model, drain_timeout=MODEL_DRAIN_TIMEOUT_SECONDS)
+
+# Caps images in flight so a burst is shed with 429s instead of queueing without bound
+admission = AdmissionController(MAX_IN_FLIGHT_IMAGES)
+
+_load_task = None
+
+
+def start_loading(model_path: str, version: Optional[str], traffic_percent: float = 100.0):
+    # Load and warm up in the background; the current version keeps serving meanwhile
+    global _load_task
+    _load_task = registry.start_loading(model_path, version, traffic_percent)
+
+
+@app.on_event("startup")
+async def start_inference():
+    # The server comes up straight away and reports not-ready until the first model is warm
+    start_loading(MODEL_PATH, MODEL_VERSION)
+
+
+@app.on_event("shutdown")
+async def stop_inference():
+    if _load_task and not _load_task.done():
+        _load_task.cancel()
+    await registry.stop()
+
+
+def require_ready():
+    if not registry.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model is {registry.load_state['status']}",
+            headers={"Retry-After": "5"},
+        )
+
+
+def admit(images: int):
+    """
+    Reserve in-flight slots for a request; callers must admission.release() them.
+    """
+    if not admission.try_acquire(images):
+        raise HTTPException(
+            status_code=429,
+            detail="Too many images in flight, retry later",
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+        )
+
+
+def deadline_response(error: Exception) -> JSONResponse:
+    return JSONResponse(
+        content={"error": str(error)},
+        status_code=503,
+        headers={"Retry-After": str(RETRY_AFTER_SECONDS)},
+    )
+
+
 # Pydantic model to handle the Base64 input
 class ImageRequest(BaseModel):
     image_base64: str  # Base64 encoded image string
 
+
+class BatchImageRequest(BaseModel):
+    images_base64: List[str]  # Base64 encoded image strings
+
+
+class LoadModelRequest(BaseModel):
+    model_path: str  # Relative to MODEL_DIR
+    model_version: Optional[str] = None  # Defaults to the file name
+    traffic_percent: float = 100.0  # Below 100 the model serves side by side as the candidate
+
+
+class TrafficRequest(BaseModel):
+    traffic_percent: float  # Candidate's share; 100 promotes it, 0 removes it
+
+
+def format_prediction(prediction, model_version: str, embedding=None) -> dict:
+    predicted_class_idx = np.argmax(prediction)
+    result = {
+        "predicted_class": class_labels[predicted_class_idx],
+        "confidence": float(np.max(prediction)),
+        "model_version": model_version,
+    }
+    if embedding is not None:
+        result["embedding"] = [round(float(value), 6) for value in embedding]
+    return result
+
+async def read_image_bytes(request: Request) -> bytes:
+    """
+    Raw image bytes from a /predict/ request body: application/octet-stream
+    (or image/*), multipart/form-data with one file part, or JSON
+    {"image_base64": ...}.
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith(("application/octet-stream", "image/")):
+        img_data = await request.body()
+    elif content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        uploads = [value for _, value in form.multi_items() if hasattr(value, "read")]
+        if len(uploads) != 1:
+            raise HTTPException(status_code=400, detail=f"Expected one image file, got {len(uploads)}")
+        img_data = await uploads[0].read()
+    else:
+        try:
+            body = ImageRequest(**await request.json())
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Invalid request: {e}")
+        # Decode the Base64 string to bytes
+        try:
+            img_data = base64.b64decode(body.image_base64)
+        except Exception as e:
+            raise HTTPException(status_code=400, detail=f"Invalid base64 image: {e}")
+
+    if not img_data:
+        raise HTTPException(status_code=400, detail="Empty image")
+    return img_data
+
+
 # Define a POST endpoint for image classification
 @app.post("/predict/")
-async def predict(request: ImageRequest):
-    try:
-        # Decode the Base64 string to bytes
-        img_data = base64.b64decode(request.image_base64)
-        img = Image.open(BytesIO(img_data))
+async def predict(request: Request, include_embedding: bool = False):
+    """
+    Classify one image. Binary bodies avoid the base64 round trip: the
+    payload is a third smaller and the server never holds the encoded string.
 
-        # Resize and preprocess the image for the model (224x224 for ResNet50)
-        img = img.resize((224, 224))
-        img_array = np.array(img)
-        img_array = np.expand_dims(img_array, axis=0)  # Add batch dimension
-        img_array = img_array / 255.0  # Normalize image
+    With ?include_embedding=true the response also carries the image's
+    L2-normalized backbone embedding, for near-duplicate search. Models that
+    can't produce embeddings answer with the plain prediction.
+    """
+    require_ready()
+    deadline = deadline_after(REQUEST_DEADLINE_MS)
+    admit(1)
+    try:
+        img_data = await read_image_bytes(request)
 
-        # Make prediction
-        predictions = model.predict(img_array)
-        predicted_class_idx = np.argmax(predictions[0])
-        confidence = float(np.max(predictions[0]))
+        # Decode and resize in a worker thread so the event loop keeps serving requests
+        img_array = await asyncio.to_thread(preprocess, img_data)
 
-        # Get the predicted class name
-        predicted_class = class_labels[predicted_class_idx]
+        # Make prediction as part of the next batch of the version picked for this request
+        embedding = None
+        with registry.use() as model:
+            if include_embedding and model.embedder.supported:
+                prediction, embedding = await model.embed_batcher.submit(img_array, deadline)
+            else:
+                prediction = await model.batcher.submit(img_array, deadline)
 
-        return JSONResponse(content={
-            "predicted_class": predicted_class,
-            "confidence": confidence
-        })
+        return JSONResponse(content=format_prediction(prediction, model.version, embedding))
 
+    except HTTPException:
+        raise
+    except DeadlineExceeded as e:
+        admission.record_expired()
+        return deadline_response(e)
+    except ModelStopped as e:
+        # Retired mid-request; a retry goes to the version serving now
+        return deadline_response(e)
     except Exception as e:
         return JSONResponse(content={"error": str(e)}, status_code=500)
+    finally:
+        admission.release(1)
+
+
+def decode_base64_image(image_base64: str) -> np.ndarray:
+    return load_image(base64.b64decode(image_base64))
+
+
+@app.post("/predict/batch")
+async def predict_batch(request: Request, include_embedding: bool = False):
+    """
+    Classify many images in one call.
+
+    Send JSON {"images_base64": [...]} or a multipart/form-data body with one
+    file part per image (any field name). Results come back in input order;
+    an image that can't be decoded or classified gets an "error" entry
+    instead of failing the batch.
+    """
+    require_ready()
+    deadline = deadline_after(REQUEST_DEADLINE_MS)
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        uploads = [value for _, value in form.multi_items() if hasattr(value, "read")]
+        raw_images = [await upload.read() for upload in uploads]
+        decode = load_image
+    else:
+        try:
+            body = BatchImageRequest(**await request.json())
+        except Exception as e:
+            raise HTTPException(status_code=422, detail=f"Invalid batch request: {e}")
+        raw_images = body.images_base64
+        decode = decode_base64_image
+
+    if not raw_images:
+        raise HTTPException(status_code=400, detail="No images provided")
+    if len(raw_images) > MAX_BATCH_REQUEST_IMAGES:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Too many images: {len(raw_images)} (max {MAX_BATCH_REQUEST_IMAGES})"
+        )
+
+    admit(len(raw_images))
+    try:
+        # The whole request goes to one version
+        with registry.use() as model:
+            return await classify_batch(model, raw_images, decode, deadline, include_embedding)
+    finally:
+        admission.release(len(raw_images))
+
+
+async def classify_batch(
+    model: ModelVersion, raw_images: list, decode, deadline, include_embedding: bool
+) -> JSONResponse:
+    # Decode and resize all images in parallel worker threads; normalization is done per chunk
+    decoded = await asyncio.gather(
+        *[asyncio.to_thread(decode, raw) for raw in raw_images],
+        return_exceptions=True
+    )
+
+    results = [None] * len(decoded)
+    valid = []
+    for index, item in enumerate(decoded):
+        if isinstance(item, Exception):
+            results[index] = {"index": index, "error": f"Could not decode image: {item}"}
+        elif item.shape != model.batcher.input_shape:
+            results[index] = {"index": index, "error": f"Unsupported image shape {item.shape}"}
+        else:
+            valid.append((index, item))
+
+    # Models without pooled features answer with plain predictions
+    include_embedding = include_embedding and model.embedder.supported
+
+    # Run the decoded images through the model in chunks, spread over the workers
+    chunks = [valid[i:i + BATCH_REQUEST_CHUNK_SIZE] for i in range(0, len(valid), BATCH_REQUEST_CHUNK_SIZE)]
+    chunk_predictions = await asyncio.gather(
+        *[(model.embedder if include_embedding else model).predict(preprocess_batch([image for _, image in chunk]), deadline) for chunk in chunks],
+        return_exceptions=True
+    )
+    for chunk, predictions in zip(chunks, chunk_predictions):
+        if isinstance(predictions, DeadlineExceeded):
+            admission.record_expired(len(chunk))
+        for row, (index, _) in enumerate(chunk):
+            if isinstance(predictions, Exception):
+                results[index] = {"index": index, "error": f"Prediction failed: {predictions}"}
+            elif include_embedding:
+                probabilities, embeddings = predictions
+                results[index] = {
+                    "index": index, **format_prediction(probabilities[row], model.version, embeddings[row])
+                }
+            else:
+                results[index] = {"index": index, **format_prediction(predictions[row], model.version)}
+
+    return JSONResponse(content={"results": results, "model_version": model.version})
+
+@app.get("/ready")
+async def ready():
+    """
+    Readiness probe: 200 once the model is loaded and warmed up, 503 before that
+    or if loading failed.
+    """
+    content = {
+        "status": "ready" if registry.ready else registry.load_state["status"],
+        "routing": registry.routing(),
+        "load": registry.load_state,
+    }
+    return JSONResponse(content=content, status_code=200 if registry.ready else 503)
+
+
+@app.get("/models")
+async def list_models():
+    return registry.stats()
+
+
+def require_admin(authorization: Optional[str] = Header(default=None)):
+    """
+    Model management needs the MODEL_ADMIN_TOKEN bearer token, and is off while no token is configured.
+    """
+    if not MODEL_ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Model management is disabled (MODEL_ADMIN_TOKEN is not set)")
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), MODEL_ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token", headers={"WWW-Authenticate": "Bearer"})
+
+
+def resolve_model_path(model_path: str) -> str:
+    """
+    Absolute path of a model inside MODEL_DIR; anything resolving outside it
+    (absolute paths elsewhere, "..", symlinks out) is rejected.
+    """
+    path = os.path.realpath(os.path.join(MODEL_DIR, model_path))
+    if os.path.commonpath([path, MODEL_DIR]) != MODEL_DIR:
+        raise HTTPException(status_code=400, detail="model_path must be inside the model directory")
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail=f"No model at {model_path}")
+    return path
+
+
+@app.post("/models/load", status_code=202, dependencies=[Depends(require_admin)])
+async def load_model_version(request: LoadModelRequest):
+    """
+    Load a model version in the background, warm it up, then switch
+    `traffic_percent` of requests to it. Poll GET /models for progress.
+    """
+    model_path = resolve_model_path(request.model_path)
+    try:
+        start_loading(model_path, request.model_version, request.traffic_percent)
+    except LoadInProgress as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return {"status": "loading", "model_path": request.model_path}
+
+
+@app.post("/models/traffic", dependencies=[Depends(require_admin)])
+async def set_model_traffic(request: TrafficRequest):
+    """
+    Set the candidate version's share of traffic: 100 promotes it, 0 removes it.
+    """
+    try:
+        registry.set_traffic(request.traffic_percent)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"routing": registry.routing()}
+
+
+@app.get("/stats")
+async def stats():
+    return {"models": registry.stats(), "admission": admission.stats(), "preprocessing": timings.stats()}
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,264 @@
+import asyncio
+import logging
+import os
+import random
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional, Set
+
+import numpy as np
+
+from batching import MicroBatcher
+from cascade import CascadePredictor
+from embeddings import EmbeddingPredictor
+from inference_pool import InferencePool
+
+logger = logging.getLogger(__name__)
+
+
+class LoadInProgress(Exception):
+    """
+    Raised by start_loading() while another version is still loading.
+    """
+
+
+def default_model_version(model_path: str) -> str:
+    """
+    Version name for a model file when none is given: the file name without extension.
+    """
+    return os.path.splitext(os.path.basename(model_path.rstrip("/\\")))[0]
+
+
+class ModelVersion:
+    """
+    One loaded model with its own inference pool and micro-batcher, optionally
+    fronted by a cascade whose first stage runs on a pool of its own.
+    Requests that want embeddings go through `embed_batcher` instead, which
+    runs the full model and so skips the cascade.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        model_path: str,
+        pool: InferencePool,
+        batcher: MicroBatcher,
+        cascade: Optional[CascadePredictor] = None,
+        embedder: Optional[EmbeddingPredictor] = None,
+        embed_batcher: Optional[MicroBatcher] = None,
+    ):
+        self.version = version
+        self.model_path = model_path
+        self.pool = pool
+        self.batcher = batcher
+        self.cascade = cascade
+        self.embedder = embedder
+        self.embed_batcher = embed_batcher
+        self.batchers = [batcher] + ([embed_batcher] if embed_batcher else [])
+        self.pools = [pool] + ([cascade.first_stage] if cascade else [])
+        self.active_requests = 0
+        self.requests_served = 0
+        self.load_seconds: Optional[float] = None
+
+    async def start(self):
+        started = time.perf_counter()
+        # Loading the model blocks for seconds; keep the event loop free meanwhile
+        for pool in self.pools:
+            await asyncio.to_thread(pool.start)
+            await pool.warm_up()
+        for batcher in self.batchers:
+            await batcher.start()
+        self.load_seconds = time.perf_counter() - started
+
+    async def stop(self):
+        for batcher in self.batchers:
+            await batcher.stop()
+        for pool in self.pools:
+            pool.shutdown()
+
+    async def predict(self, batch: np.ndarray, deadline: Optional[float] = None) -> np.ndarray:
+        """
+        Run a whole batch directly, bypassing the micro-batcher.
+        """
+        if self.cascade:
+            return await self.cascade.predict(batch, deadline)
+        return await self.pool.predict(batch, deadline)
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "model_path": self.model_path,
+            "load_seconds": self.load_seconds,
+            "active_requests": self.active_requests,
+            "requests_served": self.requests_served,
+            "batching": self.batcher.stats(),
+            "cascade": self.cascade.stats() if self.cascade else None,
+            "embeddings": self.embedder.stats() if self.embedder else None,
+        }
+
+
+class ModelRegistry:
+    """
+    Serves a primary model and optionally a candidate that gets
+    `candidate_percent` of the traffic.
+
+    New versions are loaded and warmed up in the background while the current
+    ones keep serving, then swapped in with a single reference assignment. A
+    replaced version finishes its in-flight requests (up to `drain_timeout`)
+    before its workers are shut down; anything still queued on it after that
+    fails with ModelStopped rather than hanging.
+    """
+
+    def __init__(self, build: Callable[[str, str], ModelVersion], drain_timeout: float = 30.0):
+        self.build = build
+        self.drain_timeout = drain_timeout
+        self.primary: Optional[ModelVersion] = None
+        self.candidate: Optional[ModelVersion] = None
+        self.candidate_percent = 0.0
+        # State of the most recent load: idle, loading, loaded or failed
+        self.load_state = {"status": "idle", "version": None, "error": None}
+        self._load_lock = asyncio.Lock()
+        # Set by start_loading() before its task exists, so two calls in one tick can't both start
+        self._load_task: Optional[asyncio.Task] = None
+        # Drains of retired versions, referenced until done so they can't be garbage-collected
+        self._retiring: Set[asyncio.Task] = set()
+
+    @property
+    def ready(self) -> bool:
+        return self.primary is not None
+
+    @property
+    def loading(self) -> bool:
+        return self._load_lock.locked() or (self._load_task is not None and not self._load_task.done())
+
+    def choose(self) -> ModelVersion:
+        if self.candidate and random.random() * 100 < self.candidate_percent:
+            return self.candidate
+        return self.primary
+
+    @contextmanager
+    def use(self):
+        """
+        Pick a version for one request and keep it from being shut down until the request is done.
+        """
+        model = self.choose()
+        model.active_requests += 1
+        try:
+            yield model
+        finally:
+            model.active_requests -= 1
+            model.requests_served += 1
+
+    async def load(self, model_path: str, version: Optional[str] = None, traffic_percent: float = 100.0):
+        """
+        Load and warm up a model, then route `traffic_percent` of requests to it.
+        100 replaces the primary; anything less makes it the candidate,
+        replacing any previous candidate.
+        """
+        version = version or default_model_version(model_path)
+        async with self._load_lock:
+            self.load_state = {"status": "loading", "version": version, "error": None}
+            model = self.build(model_path, version)
+            try:
+                await model.start()
+            except Exception as e:
+                logger.error(f"Failed to load model {version} from {model_path}: {e}", exc_info=True)
+                self.load_state = {"status": "failed", "version": version, "error": str(e)}
+                await model.stop()
+                raise
+            self.load_state = {"status": "loaded", "version": version, "error": None}
+            logger.info(f"Model {version} loaded and warmed up in {model.load_seconds:.2f}s")
+
+            if traffic_percent >= 100 or self.primary is None:
+                retired, self.primary = self.primary, model
+                # A candidate tested against the old primary is dropped along with it
+                retired_candidate, self.candidate = self.candidate, None
+                self.candidate_percent = 0.0
+                self._retire(retired, retired_candidate)
+            else:
+                retired, self.candidate = self.candidate, model
+                self.candidate_percent = max(0.0, traffic_percent)
+                self._retire(retired)
+            logger.info(f"Serving {self.routing()}")
+
+    def start_loading(
+        self, model_path: str, version: Optional[str] = None, traffic_percent: float = 100.0
+    ) -> asyncio.Task:
+        """
+        Run load() in the background; the current versions keep serving
+        meanwhile. Raises LoadInProgress if a load is already running.
+        Failures are logged and recorded in `load_state`.
+        """
+        if self.loading:
+            raise LoadInProgress(f"Already loading {self.load_state['version']}")
+        version = version or default_model_version(model_path)
+        self.load_state = {"status": "loading", "version": version, "error": None}
+        self._load_task = asyncio.create_task(self._load_in_background(model_path, version, traffic_percent))
+        return self._load_task
+
+    async def _load_in_background(self, model_path: str, version: str, traffic_percent: float):
+        try:
+            await self.load(model_path, version, traffic_percent)
+        except Exception:
+            pass  # Logged and recorded in load_state
+
+    def set_traffic(self, percent: float):
+        """
+        Change the candidate's share of traffic. 100 promotes it to primary;
+        0 removes it.
+        """
+        if self.candidate is None:
+            raise ValueError("No candidate model loaded")
+        if percent >= 100:
+            retired, self.primary = self.primary, self.candidate
+            self.candidate, self.candidate_percent = None, 0.0
+            self._retire(retired)
+        elif percent <= 0:
+            retired, self.candidate = self.candidate, None
+            self.candidate_percent = 0.0
+            self._retire(retired)
+        else:
+            self.candidate_percent = percent
+        logger.info(f"Serving {self.routing()}")
+
+    def _retire(self, *models: Optional[ModelVersion]):
+        for model in models:
+            if model is not None:
+                task = asyncio.create_task(self._drain_and_stop(model))
+                self._retiring.add(task)
+                task.add_done_callback(self._retiring.discard)
+
+    async def _drain_and_stop(self, model: ModelVersion):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.drain_timeout
+        while model.active_requests and loop.time() < deadline:
+            await asyncio.sleep(0.05)
+        if model.active_requests:
+            logger.warning(f"Stopping model {model.version} with {model.active_requests} requests still running")
+        await model.stop()
+        logger.info(f"Model {model.version} retired")
+
+    async def stop(self):
+        for model in (self.primary, self.candidate):
+            if model is not None:
+                await model.stop()
+        self.primary = self.candidate = None
+        if self._retiring:
+            await asyncio.gather(*self._retiring, return_exceptions=True)
+
+    def routing(self) -> dict:
+        routing = {}
+        if self.primary:
+            routing[self.primary.version] = 100.0 - (self.candidate_percent if self.candidate else 0.0)
+        if self.candidate:
+            routing[self.candidate.version] = self.candidate_percent
+        return routing
+
+    def stats(self) -> dict:
+        return {
+            "routing": self.routing(),
+            "primary": self.primary.stats() if self.primary else None,
+            "candidate": self.candidate.stats() if self.candidate else None,
+            "load": dict(self.load_state),
+            "retiring": len(self._retiring),
+        }
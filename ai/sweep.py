@@ -0,0 +1,118 @@
+"""
+Train several training.py configurations in parallel processes.
+
+The sweep file maps run names to training.py options, plus optional options
+common to every run:
+
+    {
+        "common": {"data": "dataset_tfrecords", "epochs": 20},
+        "runs": {
+            "resnet50": {},
+            "resnet50-augment": {"augment": true},
+            "mobilenet-v3": {"arch": "mobilenet_v3_large", "distill-from": "civic_mirror_model.h5"}
+        }
+    }
+
+    python sweep.py sweep.json --jobs 3
+
+Each run gets runs/<sweep>/<name>/ (checkpoints, metrics.csv/json, summary.json,
+log.txt) and writes its model there; the cores are split evenly between the
+jobs running at once. Starting the same sweep again skips finished runs and
+resumes interrupted ones from their last epoch. Runs that share a
+--feature-cache should not extract features concurrently, so warm that cache
+with one run first.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def command_line(options: dict) -> list:
+    """
+    {"augment": true, "epochs": 20} -> ["--augment", "--epochs", "20"]. False or null omits the option.
+    """
+    argv = []
+    for name, value in options.items():
+        flag = "--" + name
+        if value is True:
+            argv.append(flag)
+        elif value is not False and value is not None:
+            argv += [flag, str(value)]
+    return argv
+
+
+def run(name: str, options: dict, run_dir: str, threads: int) -> dict:
+    os.makedirs(run_dir, exist_ok=True)
+    summary_path = os.path.join(run_dir, "summary.json")
+    if os.path.exists(summary_path):
+        print(f"[{name}] already finished")
+        with open(summary_path) as f:
+            return {"name": name, "status": "finished", **json.load(f)}
+
+    options = {option.replace("_", "-"): value for option, value in options.items()}
+    options = {"output": os.path.join(run_dir, "model.h5"), **options, "run-dir": run_dir, "threads": threads}
+    if options.get("dataset-cache"):
+        # tf.data cache files can't be shared by concurrent runs
+        options["dataset-cache"] = f"{options['dataset-cache']}_{name}"
+    argv = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "training.py")]
+    argv += command_line(options)
+    # Concurrent runs on one GPU must not each grab all of its memory
+    env = {**os.environ, "TF_FORCE_GPU_ALLOW_GROWTH": "true", "OMP_NUM_THREADS": str(threads)}
+
+    print(f"[{name}] starting: {' '.join(argv[1:])}")
+    started = time.time()
+    with open(os.path.join(run_dir, "log.txt"), "a") as log:
+        returncode = subprocess.run(argv, stdout=log, stderr=subprocess.STDOUT, env=env).returncode
+    minutes = (time.time() - started) / 60
+    if returncode != 0 or not os.path.exists(summary_path):
+        print(f"[{name}] failed with exit code {returncode} after {minutes:.1f} min, see {run_dir}/log.txt")
+        return {"name": name, "status": "failed", "returncode": returncode}
+    print(f"[{name}] finished in {minutes:.1f} min")
+    with open(summary_path) as f:
+        return {"name": name, "status": "finished", "minutes": round(minutes, 1), **json.load(f)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run training.py configurations in parallel.")
+    parser.add_argument("sweep", help="JSON sweep file")
+    parser.add_argument("--jobs", type=int, default=2, help="runs at once")
+    parser.add_argument("--out", default="", help="sweep directory; default runs/<sweep file name>")
+    args = parser.parse_args()
+
+    with open(args.sweep) as f:
+        sweep = json.load(f)
+    common = sweep.get("common", {})
+    out_dir = args.out or os.path.join("runs", os.path.splitext(os.path.basename(args.sweep))[0])
+    threads = max(1, (os.cpu_count() or 1) // args.jobs)
+
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        futures = [
+            executor.submit(run, name, {**common, **options}, os.path.join(out_dir, name), threads)
+            for name, options in sweep["runs"].items()
+        ]
+        results = [future.result() for future in futures]
+
+    print(f"\n{'run':<24}{'status':<10}{'epochs':>7}{'best':>6}{'val_acc':>9}{'val_loss':>9}")
+    for result in results:
+        if result["status"] == "finished":
+            best = result["best"]
+            print(f"{result['name']:<24}{result['status']:<10}{result['epochs_run']:>7}{result['best_epoch']:>6}"
+                  f"{best['val_accuracy']:>9.3f}{best['val_loss']:>9.3f}")
+        else:
+            print(f"{result['name']:<24}{result['status']:<10}")
+
+    results_path = os.path.join(out_dir, "sweep_results.json")
+    os.makedirs(out_dir, exist_ok=True)
+    with open(results_path, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWrote {results_path}")
+    if any(result["status"] != "finished" for result in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,53 +1,508 @@
 import tensorflow as tf
-from tensorflow.keras.preprocessing.image import ImageDataGenerator
-from tensorflow.keras.applications import ResNet50
+from tensorflow.keras.applications import ResNet50, MobileNetV2, MobileNetV3Small, MobileNetV3Large, EfficientNetB0
 from tensorflow.keras import layers, models
-import matplotlib.pyplot as plt
+import matplotlib
+import numpy as np
+import argparse
+import json
 import os
+import time
+
+matplotlib.use("Agg")  # Headless: the accuracy plot is written to the run directory
+import matplotlib.pyplot as plt
+
+from build_dataset import load_split, read_manifest
+from feature_cache import FeatureCache
+
+parser = argparse.ArgumentParser(description="Train the civic issue classifier.")
+parser.add_argument("--arch", choices=["resnet50", "mobilenet_v2", "mobilenet_v3_small", "mobilenet_v3_large",
+                                       "efficientnet_b0"], default="resnet50",
+                    help="mobilenet_v2 trains the small first-stage model for cascade serving; "
+                         "the others are student sizes for --distill-from")
+parser.add_argument("--output", default=None, help="model file to write")
+parser.add_argument("--epochs", type=int, default=10)
+parser.add_argument("--cached-features", action="store_true",
+                    help="extract frozen-backbone features once into --feature-cache and train only the head")
+parser.add_argument("--feature-cache", default="feature_cache")
+parser.add_argument("--augment", action="store_true",
+                    help="random flips, rotation, zoom and contrast while training (not with --cached-features)")
+parser.add_argument("--mixed-precision", action="store_true",
+                    help="train in mixed_float16 (GPU); the saved model is float32")
+parser.add_argument("--dataset-cache", default="",
+                    help="file prefix for tf.data's decoded-image cache; empty caches in memory")
+parser.add_argument("--data", default="",
+                    help="TFRecord dataset written by build_dataset.py, instead of dataset/train and dataset/validation")
+parser.add_argument("--distill-from", default="", metavar="TEACHER",
+                    help="train --arch as a student on this trained model's soft labels, "
+                         "then compare the two on CPU")
+parser.add_argument("--temperature", type=float, default=4.0, help="softening temperature for --distill-from")
+parser.add_argument("--alpha", type=float, default=0.3,
+                    help="weight of the true-label loss for --distill-from; the rest is the teacher's")
+parser.add_argument("--run-dir", default="",
+                    help="checkpoints and metrics for this run; default runs/<output file name>. "
+                         "Rerunning after a crash or interrupt resumes from the last completed epoch")
+parser.add_argument("--patience", type=int, default=3,
+                    help="stop after this many epochs without val_loss improving, keeping the best weights; 0 disables")
+parser.add_argument("--threads", type=int, default=0,
+                    help="TensorFlow op threads; 0 uses every core (sweep.py sets this per run)")
+parser.add_argument("--benchmark-input", type=int, nargs="?", const=2, default=0, metavar="EPOCHS",
+                    help="only run the input pipeline for EPOCHS epochs and report images/sec")
+args = parser.parse_args()
+if args.data and args.cached_features:
+    parser.error("--cached-features reads the loose image files; it can't be combined with --data")
+if args.distill_from and args.cached_features:
+    parser.error("--distill-from runs the teacher on every training batch; it can't be combined with --cached-features")
 
 # Path setup
 train_dir = "dataset/train"
 val_dir = "dataset/validation"
 img_size = (224, 224)
 batch_size = 32
-epochs = 10
+epochs = args.epochs
+if args.distill_from:
+    default_output = "civic_mirror_student.h5"
+elif args.arch == "resnet50":
+    default_output = "civic_mirror_model_V1.h5"
+else:
+    default_output = "civic_mirror_mobilenet.h5"
+output_path = args.output or default_output
+run_dir = args.run_dir or os.path.join("runs", os.path.splitext(os.path.basename(output_path))[0])
+image_extensions = (".png", ".jpg", ".jpeg", ".bmp", ".ppm", ".tif", ".tiff")  # As flow_from_directory
+AUTOTUNE = tf.data.AUTOTUNE
 
-# Data loading
-train_datagen = ImageDataGenerator(rescale=1./255)
-val_datagen = ImageDataGenerator(rescale=1./255)
+if args.threads:
+    tf.config.threading.set_intra_op_parallelism_threads(args.threads)
+    tf.config.threading.set_inter_op_parallelism_threads(min(args.threads, 2))
 
-train_gen = train_datagen.flow_from_directory(
-    train_dir, target_size=img_size, batch_size=batch_size, class_mode='categorical')
 
-val_gen = val_datagen.flow_from_directory(
-    val_dir, target_size=img_size, batch_size=batch_size, class_mode='categorical')
+def build_backbone(arch, weights='imagenet'):
+    """
+    Frozen ImageNet backbone, plus any layers that go in front of it so the model takes [0, 1] input.
+    """
+    if arch == "mobilenet_v2":
+        base_model = MobileNetV2(weights=weights, include_top=False, input_shape=(224, 224, 3))
+        # MobileNetV2 expects [-1, 1]; rescale inside the model so serving keeps feeding [0, 1] like ResNet50
+        input_layers = [layers.Rescaling(2.0, offset=-1.0, input_shape=(224, 224, 3))]
+    elif arch in ("mobilenet_v3_small", "mobilenet_v3_large", "efficientnet_b0"):
+        application = {
+            "mobilenet_v3_small": MobileNetV3Small,
+            "mobilenet_v3_large": MobileNetV3Large,
+            "efficientnet_b0": EfficientNetB0,
+        }[arch]
+        base_model = application(weights=weights, include_top=False, input_shape=(224, 224, 3))
+        # These normalize internally and expect [0, 255]
+        input_layers = [layers.Rescaling(255.0, input_shape=(224, 224, 3))]
+    else:
+        base_model = ResNet50(weights=weights, include_top=False, input_shape=(224, 224, 3))
+        input_layers = []
+    base_model.trainable = False  # Freeze weights
+    return base_model, input_layers
 
-# Load base model
-base_model = ResNet50(weights='imagenet', include_top=False, input_shape=(224, 224, 3))
-base_model.trainable = False  # Freeze weights
-
-# Add custom head
-model = models.Sequential([
-    base_model,
-    layers.GlobalAveragePooling2D(),
-    layers.Dense(128, activation='relu'),
-    layers.Dropout(0.5),
-    layers.Dense(train_gen.num_classes, activation='softmax')
+
+def build_head(num_classes):
+    return [
+        layers.Dense(128, activation='relu'),
+        layers.Dropout(0.5),
+        # float32 output keeps softmax numerically stable under mixed precision
+        layers.Dense(num_classes, activation='softmax', dtype='float32')
+    ]
+
+
+def list_images(directory):
+    """
+    Image paths and class indices, with classes in the same order as flow_from_directory.
+    """
+    classes = sorted(d for d in os.listdir(directory) if os.path.isdir(os.path.join(directory, d)))
+    paths, labels = [], []
+    for class_index, class_name in enumerate(classes):
+        for name in sorted(os.listdir(os.path.join(directory, class_name))):
+            if name.lower().endswith(image_extensions):
+                paths.append(os.path.join(directory, class_name, name))
+                labels.append(class_index)
+    return paths, np.array(labels), classes
+
+
+# How load_image and prepare_dataset turn a file into model input. Part of the feature cache
+# key, so update it whenever either changes
+INPUT_PIPELINE = {
+    "loader": "tf.data from image files",
+    "decode": "tf.io.decode_image(channels=3)",
+    "resize": "nearest",
+    "size": list(img_size),
+    "normalize": "uint8 / 255",
+}
+
+
+def load_image(path):
+    """
+    Decode and resize one image to uint8, in the tf.data worker threads.
+    Nearest-neighbour resize matches what flow_from_directory did.
+    """
+    image = tf.io.decode_image(tf.io.read_file(path), channels=3, expand_animations=False)
+    image = tf.image.resize(image, img_size, method="nearest")
+    return tf.cast(image, tf.uint8)
+
+
+augmenter = models.Sequential([
+    layers.RandomFlip("horizontal"),
+    layers.RandomRotation(0.05),
+    layers.RandomZoom(0.1),
+    layers.RandomContrast(0.1),
 ])
 
-model.compile(optimizer='adam',
-              loss='categorical_crossentropy',
-              metrics=['accuracy'])
 
-# Train
-history = model.fit(train_gen, validation_data=val_gen, epochs=epochs)
+def make_dataset(paths, labels, training, augment=False, cache=""):
+    """
+    Parallel decode/resize of loose image files, then prepare_dataset.
+    """
+    dataset = tf.data.Dataset.from_tensor_slices((paths, labels))
+    dataset = dataset.map(lambda path, label: (load_image(path), label), num_parallel_calls=AUTOTUNE)
+    return prepare_dataset(dataset, len(paths), training, augment, cache)
+
+
+def make_record_dataset(data_dir, split, training, augment=False, cache=""):
+    """
+    Stream a split of build_dataset.py's TFRecord shards, then prepare_dataset.
+    The images are already resized, so only the JPEG decode remains.
+    """
+    dataset = load_split(data_dir, split, shuffle_shards=training)
+    size = read_manifest(data_dir)["splits"][split]["count"]
+    return prepare_dataset(dataset, size, training, augment, cache)
+
+
+def prepare_dataset(dataset, size, training, augment=False, cache=""):
+    """
+    uint8 (image, label) pairs -> cache -> (shuffle) -> batch -> normalize/augment -> prefetch.
+
+    Images are cached as resized uint8, a quarter of the float32 size, so
+    every epoch after the first skips file reads and JPEG decode entirely.
+    `cache` is a file prefix, "" for memory, or None for no cache (single
+    passes, where it would only hold every image in RAM for nothing).
+    Normalization and augmentation run per batch after the cache, so
+    augmentation differs every epoch.
+    """
+    if cache is not None:
+        dataset = dataset.cache(cache)
+    if training:
+        dataset = dataset.shuffle(min(size, 1000), reshuffle_each_iteration=True)
+    dataset = dataset.batch(batch_size)
+
+    def prepare(images, batch_labels):
+        images = tf.cast(images, tf.float32) / 255.0
+        if augment:
+            images = tf.clip_by_value(augmenter(images, training=True), 0.0, 1.0)
+        return images, batch_labels
+
+    dataset = dataset.map(prepare, num_parallel_calls=AUTOTUNE)
+    return dataset.prefetch(AUTOTUNE)
+
+
+class MetricsLogger(tf.keras.callbacks.Callback):
+    """
+    Rewrites metrics.json after every epoch with all epochs so far,
+    including those from before a resume.
+    """
+
+    def __init__(self, path, resume):
+        super().__init__()
+        self.path = path
+        self.epochs = []
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                self.epochs = json.load(f)
+
+    def on_epoch_end(self, epoch, logs=None):
+        # A resumed run repeats no epochs, but drop any recorded after the last checkpoint
+        self.epochs = [row for row in self.epochs if row["epoch"] <= epoch]
+        self.epochs.append({"epoch": epoch + 1, **{k: float(v) for k, v in (logs or {}).items()}})
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.epochs, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def training_callbacks():
+    """
+    Per-epoch backup of weights, optimizer state and epoch number (restored
+    automatically if the run is started again after dying; deleted once
+    training finishes), early stopping, and metrics as CSV and JSON.
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    backup_dir = os.path.join(run_dir, "backup")
+    resume = os.path.isdir(backup_dir)
+    if resume:
+        print(f"Resuming from the last checkpoint in {backup_dir}")
+    elif os.path.exists(os.path.join(run_dir, "summary.json")):
+        # A fresh run in a finished run's directory; the summary is rewritten when this one finishes
+        os.remove(os.path.join(run_dir, "summary.json"))
+    callbacks = [
+        tf.keras.callbacks.BackupAndRestore(backup_dir),
+        tf.keras.callbacks.CSVLogger(os.path.join(run_dir, "metrics.csv"), append=resume),
+        MetricsLogger(os.path.join(run_dir, "metrics.json"), resume),
+    ]
+    if args.patience:
+        callbacks.append(tf.keras.callbacks.EarlyStopping(
+            monitor="val_loss", patience=args.patience, restore_best_weights=True, verbose=1))
+    return callbacks
+
+
+def benchmark_input(dataset, num_epochs):
+    """
+    Pull batches through the input pipeline alone, with no model, and report
+    throughput. The first epoch decodes from disk, later ones read the cache.
+    """
+    for epoch in range(num_epochs):
+        images = 0
+        started = time.perf_counter()
+        for batch, _ in dataset:
+            images += int(batch.shape[0])
+        seconds = time.perf_counter() - started
+        print(f"Input pipeline epoch {epoch + 1}: {images} images in {seconds:.2f}s, "
+              f"{images / seconds:.1f} images/sec")
+
+
+def train_end_to_end(base_model, input_layers, train_data, val_data, num_classes):
+    # Add custom head
+    model = models.Sequential(input_layers + [
+        base_model,
+        layers.GlobalAveragePooling2D(),
+        *build_head(num_classes)
+    ])
+
+    model.compile(optimizer='adam',
+                  loss='sparse_categorical_crossentropy',
+                  metrics=['accuracy'])
+
+    # Train
+    history = model.fit(train_data, validation_data=val_data, epochs=epochs, callbacks=training_callbacks())
+    return model, history
+
+
+class Distiller(models.Model):
+    """
+    Trains `student` on a weighted sum of the usual loss against the true
+    labels and the KL divergence from the frozen teacher's predictions, both
+    softened by `temperature`. Both models end in softmax, so the softened
+    distributions are computed from their log-probabilities.
+    """
+
+    def __init__(self, student, teacher, temperature, alpha):
+        super().__init__()
+        self.student = student
+        self.teacher = teacher
+        self.temperature = temperature
+        self.alpha = alpha
+        self.student_loss = tf.keras.losses.SparseCategoricalCrossentropy()
+        self.distillation_loss = tf.keras.losses.KLDivergence()
+        self.accuracy = tf.keras.metrics.SparseCategoricalAccuracy(name="accuracy")
+        self.loss_tracker = tf.keras.metrics.Mean(name="loss")
+
+    @property
+    def metrics(self):
+        return [self.loss_tracker, self.accuracy]
+
+    def soften(self, probabilities):
+        log_probabilities = tf.math.log(tf.clip_by_value(tf.cast(probabilities, tf.float32), 1e-7, 1.0))
+        return tf.nn.softmax(log_probabilities / self.temperature)
+
+    def call(self, images, training=False):
+        return self.student(images, training=training)
+
+    def train_step(self, data):
+        images, labels = data
+        teacher_predictions = self.teacher(images, training=False)
+        with tf.GradientTape() as tape:
+            student_predictions = self.student(images, training=True)
+            loss = (
+                self.alpha * self.student_loss(labels, student_predictions)
+                + (1 - self.alpha) * self.temperature ** 2
+                * self.distillation_loss(self.soften(teacher_predictions), self.soften(student_predictions))
+            )
+            scaled_loss = self.optimizer.get_scaled_loss(loss) if args.mixed_precision else loss
+        gradients = tape.gradient(scaled_loss, self.student.trainable_variables)
+        if args.mixed_precision:
+            gradients = self.optimizer.get_unscaled_gradients(gradients)
+        self.optimizer.apply_gradients(zip(gradients, self.student.trainable_variables))
+        self.loss_tracker.update_state(loss)
+        self.accuracy.update_state(labels, student_predictions)
+        return {m.name: m.result() for m in self.metrics}
+
+    def test_step(self, data):
+        images, labels = data
+        student_predictions = self.student(images, training=False)
+        self.loss_tracker.update_state(self.student_loss(labels, student_predictions))
+        self.accuracy.update_state(labels, student_predictions)
+        return {m.name: m.result() for m in self.metrics}
+
+
+def train_distilled(base_model, input_layers, train_data, val_data, num_classes):
+    teacher = models.load_model(args.distill_from)
+    teacher.trainable = False
+    student = models.Sequential(input_layers + [
+        base_model,
+        layers.GlobalAveragePooling2D(),
+        *build_head(num_classes)
+    ])
+    distiller = Distiller(student, teacher, args.temperature, args.alpha)
+    optimizer = tf.keras.optimizers.Adam()
+    if args.mixed_precision:
+        optimizer = tf.keras.mixed_precision.LossScaleOptimizer(optimizer)
+    distiller.compile(optimizer=optimizer)
+
+    # Train
+    history = distiller.fit(train_data, validation_data=val_data, epochs=epochs, callbacks=training_callbacks())
+    student.compile(optimizer='adam',
+                    loss='sparse_categorical_crossentropy',
+                    metrics=['accuracy'])
+    return student, history
+
+
+def compare_with_teacher(teacher_path, student_path, student_parameters):
+    """
+    Load both saved models the way the inference service does and compare
+    accuracy, size and single-image/batched latency, on CPU.
+    """
+    from export_model import evaluate, load_validation_set
+
+    images, labels, _ = load_validation_set(args.data or val_dir)
+    with tf.device("/CPU:0"):
+        report = {
+            "teacher": evaluate(teacher_path, images, labels, batch_size=batch_size, latency_runs=50),
+            "student": evaluate(student_path, images, labels, batch_size=batch_size, latency_runs=50),
+        }
+    report["teacher"]["parameters"] = models.load_model(teacher_path).count_params()
+    report["student"]["parameters"] = student_parameters
+
+    print(f"\n{'model':<10}{'params':>12}{'size MB':>9}{'acc':>8}{'1x p50':>9}{'1x p99':>9}{'Nx p50':>9}{'Nx p99':>9}")
+    for name, row in report.items():
+        print(f"{name:<10}{row['parameters']:>12,}{row['size_mb']:>9.1f}{row['accuracy']:>8.3f}"
+              f"{row['single_p50_ms']:>9.1f}{row['single_p99_ms']:>9.1f}"
+              f"{row['batch_p50_ms']:>9.1f}{row['batch_p99_ms']:>9.1f}")
+
+    report_path = os.path.splitext(student_path)[0] + "_distillation_report.json"
+    with open(report_path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nWrote {report_path}")
+
+
+def train_on_cached_features(base_model, input_layers, train_paths, train_labels, val_paths, val_labels, num_classes):
+    """
+    The backbone is frozen, so its pooled output for an image never changes.
+    Compute it once per image (cached on disk by content hash, so later runs
+    only process new images), then train just the head on those vectors.
+    """
+    feature_model = models.Sequential(input_layers + [base_model, layers.GlobalAveragePooling2D()])
+    # Images are never augmented here: augmentation would make the features differ every epoch
+    cache = FeatureCache(args.feature_cache, args.arch, {
+        "arch": args.arch,
+        "weights": "imagenet",
+        "precision": "mixed_float16" if args.mixed_precision else "float32",
+        "input_layers": [layer.get_config() for layer in input_layers],
+        "input_pipeline": INPUT_PIPELINE,
+    })
+
+    def extract(paths):
+        # One pass over each image, so nothing to gain from caching the decoded images
+        images = make_dataset(paths, np.zeros(len(paths), dtype=np.int64), training=False, cache=None)
+        return feature_model.predict(images, verbose=0).astype(np.float32)
+
+    train_features = cache.get_or_extract(train_paths, extract, batch_size=1024)
+    val_features = cache.get_or_extract(val_paths, extract, batch_size=1024)
+
+    head_layers = build_head(num_classes)
+    head = models.Sequential([layers.InputLayer(input_shape=train_features.shape[1:])] + head_layers)
+    head.compile(optimizer='adam',
+                 loss='sparse_categorical_crossentropy',
+                 metrics=['accuracy'])
+
+    # Train
+    history = head.fit(
+        train_features, train_labels,
+        validation_data=(val_features, val_labels),
+        batch_size=batch_size, epochs=epochs, shuffle=True, callbacks=training_callbacks()
+    )
+
+    # Put the trained head back on the backbone so the saved model is the same as end-to-end training's
+    model = models.Sequential(input_layers + [base_model, layers.GlobalAveragePooling2D()] + head_layers)
+    model.compile(optimizer='adam',
+                  loss='sparse_categorical_crossentropy',
+                  metrics=['accuracy'])
+    return model, history
+
+
+def to_float32(model, num_classes):
+    """
+    Rebuild a mixed-precision model with a float32 policy and copy the
+    weights over (they are stored in float32 either way), so serving on
+    CPU doesn't run float16 kernels.
+    """
+    tf.keras.mixed_precision.set_global_policy('float32')
+    base_model, input_layers = build_backbone(args.arch, weights=None)
+    float_model = models.Sequential(input_layers + [
+        base_model,
+        layers.GlobalAveragePooling2D(),
+        *build_head(num_classes)
+    ])
+    float_model.set_weights(model.get_weights())
+    return float_model
+
+
+train_cache = args.dataset_cache + "_train" if args.dataset_cache else ""
+val_cache = args.dataset_cache + "_val" if args.dataset_cache else ""
+if args.data:
+    classes = read_manifest(args.data)["classes"]
+    train_data = make_record_dataset(args.data, "train", training=True, augment=args.augment, cache=train_cache)
+    val_data = make_record_dataset(args.data, "validation", training=False, cache=val_cache)
+else:
+    train_paths, train_labels, classes = list_images(train_dir)
+    val_paths, val_labels, _ = list_images(val_dir)
+    train_data = make_dataset(train_paths, train_labels, training=True, augment=args.augment, cache=train_cache)
+    val_data = make_dataset(val_paths, val_labels, training=False, cache=val_cache)
+
+if args.benchmark_input:
+    benchmark_input(train_data, args.benchmark_input)
+    raise SystemExit(0)
+
+if args.mixed_precision:
+    tf.keras.mixed_precision.set_global_policy('mixed_float16')
+
+# Load base model
+base_model, input_layers = build_backbone(args.arch)
+
+if args.distill_from:
+    model, history = train_distilled(base_model, input_layers, train_data, val_data, len(classes))
+elif args.cached_features:
+    model, history = train_on_cached_features(
+        base_model, input_layers, train_paths, train_labels, val_paths, val_labels, len(classes))
+else:
+    model, history = train_end_to_end(base_model, input_layers, train_data, val_data, len(classes))
+
+if args.mixed_precision:
+    model = to_float32(model, len(classes))
 
 # Save model
-model.save("civic_mirror_model_V1.h5")
+model.save(output_path)
+
+if args.distill_from:
+    compare_with_teacher(args.distill_from, output_path, model.count_params())
+
+# Record the run and plot results from every epoch, including any before a resume
+with open(os.path.join(run_dir, "metrics.json")) as f:
+    metrics = json.load(f)
+best = min(metrics, key=lambda row: row["val_loss"])
+summary = {
+    "args": vars(args),
+    "output": output_path,
+    "epochs_run": len(metrics),
+    "best_epoch": best["epoch"],
+    "best": best,
+}
+with open(os.path.join(run_dir, "summary.json"), "w") as f:
+    json.dump(summary, f, indent=2)
+print(f"Best epoch {best['epoch']}: val_accuracy {best['val_accuracy']:.3f}, val_loss {best['val_loss']:.3f}")
 
-# Plot results
-plt.plot(history.history['accuracy'], label='Train Acc')
-plt.plot(history.history['val_accuracy'], label='Val Acc')
+plt.plot([row['accuracy'] for row in metrics], label='Train Acc')
+plt.plot([row['val_accuracy'] for row in metrics], label='Val Acc')
 plt.legend()
 plt.title('Accuracy over epochs')
-plt.show()
+plt.savefig(os.path.join(run_dir, "accuracy.png"))
@@ -1,17 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc
+from sqlalchemy import func
 from app.db.database import get_db
 from app.models.user import User, VALID_ROLES
 from app.models.report import Report, ReportStatus
 from app.schemas.report import ReportStatus
-from app.models.vote import Vote
 from app.models.user_detail import UserDetail
 from app.schemas.report import Report as ReportSchema, ReportWithVotes, ReportStatusUpdate
 from app.schemas.user import User as UserSchema
 from app.utils.deps import get_current_active_superuser
 from app.utils.twilio_service import send_sms
+from app.utils.report_hydration import hydrate_reports
+from app.utils.pagination import paginate, set_next_cursor
+from app.utils.cache import report_cache
+from app.utils.ml_client import circuit_breaker, classification_cache
+from app.utils.similarity import report_similarity_index
 from typing import Any, List, Optional
 from enum import Enum
 from pydantic import BaseModel
@@ -70,16 +74,21 @@ async def update_user_role(
 
 @router.get("/reports", response_model=List[ReportWithVotes])
 async def get_all_reports_admin(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
+    hide_duplicates: bool = False,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_superuser)
 ) -> Any:
     """
     Get reports that match the admin's role.
+    Pass hide_duplicates=true to leave out reports flagged as duplicates at ingest.
     If admin role is 'all', get all reports.
     Otherwise, only get reports that match the admin's role type.
+    Supports cursor paging via `cursor` / the X-Next-Cursor response header.
     """
     # Build base query
     query = select(Report)
@@ -88,49 +97,25 @@ async def get_all_reports_admin(
     if status:
         query = query.where(Report.status == status)
     
+    if hide_duplicates:
+        query = query.where(Report.duplicate_of_id.is_(None))
+
     # Filter by the admin's role
     if current_user.role and current_user.role != "all":
         # Admin can only see reports that match their role type
-        query = query.where(Report.type.ilike(current_user.role))
+        # lower() = lower() rather than ILIKE so the expression index can be used
+        query = query.where(func.lower(Report.type) == current_user.role.lower())
     
     # Add pagination and ordering
-    query = query.offset(skip).limit(limit).order_by(desc(Report.created_at))
+    query = paginate(query, Report.created_at, Report.id, skip, limit, cursor)
     
     # Execute query
     result = await db.execute(query)
     reports = result.scalars().all()
+    set_next_cursor(response, reports, limit)
     
-    # Process each report to add vote information
-    report_list = []
-    for report in reports:
-        # Get vote count
-        vote_count_result = await db.execute(
-            select(func.count(Vote.id)).where(Vote.report_id == report.id)
-        )
-        vote_count = vote_count_result.scalar()
-        
-        # Get user IDs who voted
-        vote_users_result = await db.execute(
-            select(Vote.user_id).where(Vote.report_id == report.id)
-        )
-        vote_users = vote_users_result.scalars().all()
-        
-        # Create report dictionary with additional fields
-        report_dict = {
-            "id": report.id,
-            "user_id": report.user_id,
-            "title": report.title,
-            "description": report.description,
-            "type": report.type,
-            "status": report.status,
-            "location": report.location,
-            "image_url": report.image_url,
-            "created_at": report.created_at,
-            "updated_at": report.updated_at,
-            "vote_count": vote_count,
-            "votes": list(vote_users)
-        }
-        report_list.append(report_dict)
+    # Attach vote data for the whole page in one query
+    report_list = await hydrate_reports(db, reports)
     
     # In the get_all_reports_admin function, add logic for the super role
     if current_user.role == "super":
@@ -140,6 +125,39 @@ async def get_all_reports_admin(
     return report_list
 
 
+@router.get("/cache/stats", response_model=dict)
+async def get_cache_stats(
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Hit/miss counters for the report and classification caches of this instance (admin only).
+    """
+    return {
+        "report": report_cache.stats(),
+        "classification": classification_cache.stats(),
+    }
+
+
+@router.get("/ml/circuit", response_model=dict)
+async def get_ml_circuit_status(
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    State and transition counts of the ML API circuit breaker for this instance (admin only).
+    """
+    return circuit_breaker.stats()
+
+
+@router.get("/similarity/stats", response_model=dict)
+async def get_similarity_index_stats(
+    current_user: User = Depends(get_current_active_superuser)
+) -> Any:
+    """
+    Size and search count of this instance's near-duplicate embedding index (admin only).
+    """
+    return report_similarity_index.stats()
+
+
 @router.patch("/reports/{report_id}/status", response_model=ReportSchema)
 async def update_report_status(
     report_id: int,
@@ -179,6 +197,7 @@ async def update_report_status(
     report.status = status_update.status.value  # Store the string value
     await db.commit()
     await db.refresh(report)
+    await report_cache.invalidate(report.id)
     
     return report
 
@@ -215,6 +234,7 @@ async def complete_report(
     report.status = ReportStatus.COMPLETED.value
     await db.commit()
     await db.refresh(report)
+    await report_cache.invalidate(report.id)
     
     # Correct user detail lookup
     user_detail_result = await db.execute(
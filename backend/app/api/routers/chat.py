@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body
+from fastapi import APIRouter, Depends, HTTPException, status, Body, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func, desc, or_
@@ -18,6 +18,7 @@ from app.schemas.chat import (
 )
 from app.utils.deps import get_current_user
 from app.utils.pusher_client import get_channel_name, trigger_message, authenticate_user
+from app.utils.pagination import paginate, set_next_cursor
 from typing import Any, List, Optional
 import logging
 
@@ -174,13 +175,16 @@ async def get_available_rooms(
 @router.get("/rooms/{room_id}/messages", response_model=List[ChatMessageWithUser])
 async def get_room_messages(
     room_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 50,
+    cursor: Optional[str] = None,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db)
 ) -> Any:
     """
     Get messages for a specific chat room.
+    Supports cursor paging via `cursor` / the X-Next-Cursor response header.
     """
     # Check if room exists
     room_result = await db.execute(select(ChatRoom).where(ChatRoom.id == room_id))
@@ -195,15 +199,16 @@ async def get_room_messages(
     # Get messages with user information
     query = select(ChatMessage, User.username) \
         .join(User, ChatMessage.user_id == User.id) \
-        .where(ChatMessage.room_id == room_id) \
-        .order_by(desc(ChatMessage.created_at)) \
-        .offset(skip).limit(limit)
+        .where(ChatMessage.room_id == room_id)
+    query = paginate(query, ChatMessage.created_at, ChatMessage.id, skip, limit, cursor)
     
     result = await db.execute(query)
+    rows = result.all()
+    set_next_cursor(response, [message for message, _ in rows], limit)
     
     # Process the results to include username
     messages_with_users = []
-    for message, username in result:
+    for message, username in rows:
         message_dict = {
             "id": message.id,
             "room_id": message.room_id,
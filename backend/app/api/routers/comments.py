@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy import func, desc
@@ -9,6 +9,9 @@ from app.models.report import Report
 from app.models.comment import Comment
 from app.schemas.comment import CommentCreate, Comment as CommentSchema, CommentWithUser
 from app.utils.deps import get_current_user
+from app.utils.report_counters import adjust_comment_count
+from app.utils.pagination import paginate, set_next_cursor
+from app.utils.cache import report_cache
 from typing import Any, List, Optional
 import logging
 
@@ -43,8 +46,10 @@ async def create_comment(
     )
     
     db.add(new_comment)
+    await adjust_comment_count(db, comment.report_id, 1)
     await db.commit()
     await db.refresh(new_comment)
+    await report_cache.invalidate(comment.report_id)
     
     return new_comment
 
@@ -52,13 +57,16 @@ async def create_comment(
 @router.get("/report/{report_id}", response_model=List[CommentWithUser])
 async def get_comments_by_report(
     report_id: int,
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get all comments for a specific report with user details.
+    Supports cursor paging via `cursor` / the X-Next-Cursor response header.
     """
     # Check if report exists
     report_result = await db.execute(select(Report).where(Report.id == report_id))
@@ -73,15 +81,16 @@ async def get_comments_by_report(
     # Get comments for the report with user info
     query = select(Comment, User.username) \
         .join(User, Comment.user_id == User.id) \
-        .where(Comment.report_id == report_id) \
-        .order_by(desc(Comment.created_at)) \
-        .offset(skip).limit(limit)
+        .where(Comment.report_id == report_id)
+    query = paginate(query, Comment.created_at, Comment.id, skip, limit, cursor)
     
     result = await db.execute(query)
+    rows = result.all()
+    set_next_cursor(response, [comment for comment, _ in rows], limit)
     
     # Process the results to include username
     comments_with_users = []
-    for comment, username in result:
+    for comment, username in rows:
         comment_dict = {
             "id": comment.id,
             "user_id": comment.user_id,
@@ -124,4 +133,7 @@ async def delete_comment(
     
     # Delete the comment
     await db.delete(comment)
-    await db.commit() 
\ No newline at end of file
+    await adjust_comment_count(db, comment.report_id, -1)
+    await db.commit()
+    await report_cache.invalidate(comment.report_id)
+ 
\ No newline at end of file
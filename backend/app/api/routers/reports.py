@@ -1,28 +1,31 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Body, File, UploadFile, Form
+from fastapi import APIRouter, Depends, HTTPException, status, Body, File, UploadFile, Form, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy import func, desc
-from sqlalchemy.orm import joinedload
 from app.db.database import get_db
 from app.models.user import User
 from app.models.report import Report, ReportStatus
 from app.models.vote import Vote
-from app.schemas.report import ReportCreate, Report as ReportSchema, ReportWithVotes
+from app.schemas.report import ReportCreate, Report as ReportSchema, ReportWithVotes, SimilarReport
 from app.schemas.vote import VoteCreate, Vote as VoteSchema
 from app.utils.deps import get_current_user
-from app.utils.s3 import upload_base64_image_to_s3
-from app.utils.ml_client import classify_image, map_classification_to_report_type
+from app.utils.report_images import process_report_image, normalize_report_type
+from app.utils.similarity import report_similarity_index, encode_embedding, decode_embedding
+from app.utils.image_jobs import enqueue_image_job
+from app.core.config import ASYNC_IMAGE_PROCESSING
+from app.utils.report_hydration import hydrate_reports, hydrate_report
+from app.utils.report_counters import adjust_vote_count
+from app.utils.pagination import paginate, set_next_cursor
+from app.utils.cache import report_cache
 from typing import Any, List, Optional
 import json
 from fastapi.openapi.docs import get_swagger_ui_html
 from fastapi.openapi.utils import get_openapi
 import re
+from datetime import datetime, timezone
 
 
 router = APIRouter()
 
-VALID_ROLES = ["garbage", "labour", "electrician", "plumber", "all"]
-
 @router.post("/", response_model=ReportSchema, summary="Create a new report with JSON and base64 image",
     description="""
     Create a new report using JSON data with a base64-encoded image.
@@ -30,6 +33,8 @@ VALID_ROLES = ["garbage", "labour", "electrician", "plumber", "all"]
     The image should be provided as a base64-encoded string in the `base64_image` field,
     and the image type (extension) should be provided in the `image_type` field (e.g., 'jpg', 'png').
     If an image is provided, the `type` field will be automatically determined by AI.
+    When asynchronous image processing is enabled, the report is returned straight away
+    with status `processing`; `image_url` and `type` are filled in by the image worker.
     """
 )
 async def create_report(
@@ -70,50 +75,34 @@ async def create_report(
     logger = logging.getLogger(__name__)
     
     image_url = None
+    model_version = None  # Classifier version, set when the model picked the type
+    embedding = None
+    duplicate_of_id = None
     report_type = report.type  # Default to user-provided type
+    report_status = ReportStatus.PENDING
+    defer_image = bool(ASYNC_IMAGE_PROCESSING and report.base64_image and report.image_type)
 
-    if report.base64_image and report.image_type:
-        logger.info(f"Image provided. Attempting upload and AI classification.")
-        # 1. Upload image to S3
-        try:
-            if not report.base64_image.strip():
-                logger.warning("Base64 image string is empty")
-                raise ValueError("Base64 image string is empty")
-            image_url = await upload_base64_image_to_s3(report.base64_image, report.image_type)
-            logger.info(f"Image uploaded successfully, URL: {image_url}")
-        except Exception as e:
-            logger.error(f"Failed to upload image: {str(e)}", exc_info=True)
-            # Decide if upload failure should prevent report creation
-            # raise HTTPException(status_code=400, detail=f"Image upload failed: {str(e)}")
+    if defer_image:
+        # Upload and classification happen in the image worker; store the report now
+        logger.info("Image provided. Queueing upload and AI classification for the image worker.")
+        report_status = ReportStatus.PROCESSING
 
-        # 2. Classify image with custom ML model
-        try:
-            logger.info("Attempting custom ML image classification...")
-            # Call the ML API with the base64 image
-            classification_result = await classify_image(report.base64_image)
-            
-            if classification_result:
-                # Map the ML classification to our report types
-                mapped_type = map_classification_to_report_type(classification_result)
-                logger.info(f"ML classification successful: {classification_result} → {mapped_type}")
-                report_type = mapped_type
-            else:
-                logger.warning(f"ML classification failed or returned null. Defaulting to 'miscellaneous'.")
-                report_type = "miscellaneous"
-        except Exception as e:
-            logger.error(f"ML classification failed: {str(e)}", exc_info=True)
-            logger.warning(f"Falling back to user-provided type: {report.type}")
-            report_type = report.type  # Explicitly fall back
+    elif report.base64_image and report.image_type:
+        logger.info(f"Image provided. Attempting upload and AI classification.")
+        # Upload to S3 and classify with the custom ML model at the same time.
+        # Upload failure leaves image_url as None; classifier failure falls back to the user type.
+        image_url, report_type, model_version, embedding = await process_report_image(
+            report.base64_image, report.image_type, report.type
+        )
+        # Flag likely duplicates of recent reports so admins handle the issue once
+        duplicate_of_id = await report_similarity_index.find_duplicate(db, model_version, embedding)
 
     else:
         logger.info("No image provided or image type missing. Using user-provided type.")
         report_type = report.type
 
-    # Remove the validation against ReportType
-    # Validate the final report_type against the enum
-    if report_type not in VALID_ROLES:
-        logger.warning(f"Invalid report type determined: '{report_type}'. Defaulting to 'miscellaneous'.")
-        report_type = "miscellaneous"  # Use the correct fallback
+    # Validate the final report_type, defaulting to 'miscellaneous'
+    report_type = normalize_report_type(report_type)
 
     # Create report with the determined type and image_url
     logger.info(f"Creating report with title: {report.title}, type: {report_type}, image_url: {image_url}")
@@ -124,32 +113,41 @@ async def create_report(
         type=report_type, # Use the determined type (Gemini or user)
         location=report.location,
         image_url=image_url,
-        status=ReportStatus.PENDING
+        model_version=model_version,
+        embedding=encode_embedding(embedding) if embedding else None,
+        embedding_updated_at=datetime.now(timezone.utc) if embedding else None,
+        duplicate_of_id=duplicate_of_id,
+        status=report_status
     )
     
     db.add(new_report)
+    if defer_image:
+        # Flush for the report ID so the job is committed in the same transaction
+        await db.flush()
+        enqueue_image_job(db, new_report.id, report.base64_image, report.image_type, report.type)
     await db.commit()
     await db.refresh(new_report)
     
     # Verify the image_url was saved correctly
     logger.info(f"Report created with ID: {new_report.id}, type: {new_report.type}, image_url: {new_report.image_url}")
     
-    # Add vote_count to the response
-    setattr(new_report, "vote_count", 0)
-    
     return new_report
 
 
 @router.get("/", response_model=List[ReportWithVotes])
 async def get_all_reports(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
     status: Optional[str] = None,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get all reports with votes.
+    Pass the X-Next-Cursor header of a page as `cursor` to fetch the next one;
+    `skip` is still honoured when no cursor is given.
     """
     # Build the query
     query = select(Report)
@@ -159,96 +157,43 @@ async def get_all_reports(
         query = query.where(Report.status == status)
     
     # Add pagination
-    query = query.offset(skip).limit(limit).order_by(desc(Report.created_at))
+    query = paginate(query, Report.created_at, Report.id, skip, limit, cursor)
     
     # Execute query
     result = await db.execute(query)
     reports = result.scalars().all()
+    set_next_cursor(response, reports, limit)
     
-    # For each report, get votes and add vote_count
-    report_list = []
-    for report in reports:
-        # Get vote count
-        vote_count_query = select(func.count(Vote.id)).where(Vote.report_id == report.id)
-        vote_count_result = await db.execute(vote_count_query)
-        vote_count = vote_count_result.scalar()
-        
-        # Get user IDs who voted
-        vote_users_query = select(Vote.user_id).where(Vote.report_id == report.id)
-        vote_users_result = await db.execute(vote_users_query)
-        vote_users = [user_id for user_id in vote_users_result.scalars().all()]
-        
-        # Create a copy of the report with additional attributes
-        report_dict = {
-            "id": report.id,
-            "user_id": report.user_id,
-            "title": report.title,
-            "description": report.description,
-            "type": report.type,
-            "status": report.status,
-            "location": report.location,
-            "image_url": report.image_url,
-            "created_at": report.created_at,
-            "updated_at": report.updated_at,
-            "vote_count": vote_count,
-            "votes": vote_users
-        }
-        report_list.append(report_dict)
-    
-    return report_list
+    # Attach vote data for the whole page in one query
+    return await hydrate_reports(db, reports)
 
 
 @router.get("/me", response_model=List[ReportWithVotes])
 async def get_user_reports(
+    response: Response,
     skip: int = 0,
     limit: int = 10,
+    cursor: Optional[str] = None,
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ) -> Any:
     """
     Get all reports created by the current user.
+    Supports cursor paging the same way as GET /reports.
     """
     # Build the query
     query = select(Report).where(Report.user_id == current_user.id)
     
     # Add pagination
-    query = query.offset(skip).limit(limit).order_by(desc(Report.created_at))
+    query = paginate(query, Report.created_at, Report.id, skip, limit, cursor)
     
     # Execute query
     result = await db.execute(query)
     reports = result.scalars().all()
+    set_next_cursor(response, reports, limit)
     
-    # For each report, get votes and add vote_count
-    report_list = []
-    for report in reports:
-        # Get vote count
-        vote_count_query = select(func.count(Vote.id)).where(Vote.report_id == report.id)
-        vote_count_result = await db.execute(vote_count_query)
-        vote_count = vote_count_result.scalar()
-        
-        # Get user IDs who voted
-        vote_users_query = select(Vote.user_id).where(Vote.report_id == report.id)
-        vote_users_result = await db.execute(vote_users_query)
-        vote_users = [user_id for user_id in vote_users_result.scalars().all()]
-        
-        # Create a copy of the report with additional attributes
-        report_dict = {
-            "id": report.id,
-            "user_id": report.user_id,
-            "title": report.title,
-            "description": report.description,
-            "type": report.type,
-            "status": report.status,
-            "location": report.location,
-            "image_url": report.image_url,
-            "created_at": report.created_at,
-            "updated_at": report.updated_at,
-            "vote_count": vote_count,
-            "votes": vote_users
-        }
-        report_list.append(report_dict)
-    
-    return report_list
+    # Attach vote data for the whole page in one query
+    return await hydrate_reports(db, reports)
 
 
 @router.get("/{report_id}", response_model=ReportWithVotes)
@@ -259,7 +204,14 @@ async def get_report(
 ) -> Any:
     """
     Get a specific report by ID.
+    Served from the report cache when possible; writes to the report invalidate it.
     """
+    # Captured before the DB read so an invalidation in between makes the entry set below unusable
+    generation = await report_cache.generation(report_id)
+    cached = await report_cache.get(report_id, generation)
+    if cached is not None:
+        return cached
+    
     # Get the report
     result = await db.execute(select(Report).where(Report.id == report_id))
     report = result.scalar_one_or_none()
@@ -270,35 +222,51 @@ async def get_report(
             detail="Report not found"
         )
     
-    # Get vote count
-    vote_count_query = select(func.count(Vote.id)).where(Vote.report_id == report.id)
-    vote_count_result = await db.execute(vote_count_query)
-    vote_count = vote_count_result.scalar()
-    
-    # Get user IDs who voted
-    vote_users_query = select(Vote.user_id).where(Vote.report_id == report.id)
-    vote_users_result = await db.execute(vote_users_query)
-    vote_users = [user_id for user_id in vote_users_result.scalars().all()]
-    
-    # Create a copy of the report with additional attributes
-    report_dict = {
-        "id": report.id,
-        "user_id": report.user_id,
-        "title": report.title,
-        "description": report.description,
-        "type": report.type,
-        "status": report.status,
-        "location": report.location,
-        "image_url": report.image_url,
-        "created_at": report.created_at,
-        "updated_at": report.updated_at,
-        "vote_count": vote_count,
-        "votes": vote_users
-    }
+    report_dict = await hydrate_report(db, report)
+    await report_cache.set(report_id, ReportWithVotes(**report_dict).model_dump(mode="json"), generation)
     
     return report_dict
 
 
+@router.get("/{report_id}/similar", response_model=List[SimilarReport])
+async def get_similar_reports(
+    report_id: int,
+    limit: int = 5,
+    min_similarity: float = 0.8,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+) -> Any:
+    """
+    Recent reports whose images look like this report's, most similar first.
+    Only reports classified by the same model version are compared.
+    """
+    result = await db.execute(select(Report).where(Report.id == report_id))
+    report = result.scalar_one_or_none()
+
+    if not report:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Report not found"
+        )
+    if report.embedding is None:
+        return []
+
+    matches = await report_similarity_index.search(
+        db, report.model_version, decode_embedding(report.embedding),
+        k=min(max(limit, 1), 50), min_similarity=min_similarity, exclude_id=report.id
+    )
+    if not matches:
+        return []
+
+    # Matches can point at reports deleted since they were indexed; those simply drop out
+    result = await db.execute(select(Report).where(Report.id.in_([match_id for match_id, _ in matches])))
+    reports_by_id = {match.id: match for match in result.scalars().all()}
+    similar = [(reports_by_id[match_id], score) for match_id, score in matches if match_id in reports_by_id]
+
+    report_list = await hydrate_reports(db, [match for match, _ in similar])
+    return [{**report_dict, "similarity": score} for report_dict, (_, score) in zip(report_list, similar)]
+
+
 @router.post("/vote", response_model=VoteSchema)
 async def vote_for_report(
     vote: VoteCreate,
@@ -340,7 +308,9 @@ async def vote_for_report(
     )
     
     db.add(new_vote)
+    await adjust_vote_count(db, vote.report_id, 1)
     await db.commit()
     await db.refresh(new_vote)
+    await report_cache.invalidate(vote.report_id)
     
     return new_vote
\ No newline at end of file
@@ -30,6 +30,61 @@ else:
 #add your env variables here
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Report read cache. Leave CACHE_URL unset for the in-process cache, or point it at redis:// to share it
+CACHE_URL = os.getenv("CACHE_URL")
+REPORT_CACHE_TTL_SECONDS = float(os.getenv("REPORT_CACHE_TTL_SECONDS", "30"))
+REPORT_CACHE_MAX_ENTRIES = int(os.getenv("REPORT_CACHE_MAX_ENTRIES", "1024"))
+
+# Per-call budgets for report image processing; both run concurrently inside the 30s Lambda timeout
+S3_UPLOAD_TIMEOUT_SECONDS = float(os.getenv("S3_UPLOAD_TIMEOUT_SECONDS", "15"))
+ML_CLASSIFY_TIMEOUT_SECONDS = float(os.getenv("ML_CLASSIFY_TIMEOUT_SECONDS", "20"))
+
+# ML API endpoint. ML_API_FORMAT "json" posts {"data": [<base64>]}; "binary" posts the raw
+# image bytes as application/octet-stream (the classifier service's /predict/)
+ML_API_URL = os.getenv("ML_API_URL", "https://your-username-civic-mirror-classifier.hf.space/api/predict")
+ML_API_FORMAT = os.getenv("ML_API_FORMAT", "json")
+
+# Pooled ML API client and its circuit breaker
+ML_HTTP_TIMEOUT_SECONDS = float(os.getenv("ML_HTTP_TIMEOUT_SECONDS", "30"))
+ML_HTTP_CONNECT_TIMEOUT_SECONDS = float(os.getenv("ML_HTTP_CONNECT_TIMEOUT_SECONDS", "3"))
+ML_HTTP_MAX_CONNECTIONS = int(os.getenv("ML_HTTP_MAX_CONNECTIONS", "20"))
+ML_HTTP_MAX_KEEPALIVE = int(os.getenv("ML_HTTP_MAX_KEEPALIVE", "10"))
+ML_BREAKER_FAILURE_THRESHOLD = int(os.getenv("ML_BREAKER_FAILURE_THRESHOLD", "5"))
+ML_BREAKER_RECOVERY_SECONDS = float(os.getenv("ML_BREAKER_RECOVERY_SECONDS", "30"))
+
+# Classification cache keyed by image content hash. ML_MODEL_VERSION is the version assumed until
+# the ML API reports one; entries from other versions are never served. The current version is
+# shared through the cache backend and re-checked every CLASSIFICATION_VERSION_REFRESH_SECONDS:
+# from ML_MODELS_URL (the classifier service's GET /models) when set, so a deploy is noticed even
+# while every lookup hits, otherwise from the versions on ML responses
+ML_MODEL_VERSION = os.getenv("ML_MODEL_VERSION", "unknown")
+ML_MODELS_URL = os.getenv("ML_MODELS_URL", "")
+CLASSIFICATION_VERSION_REFRESH_SECONDS = float(os.getenv("CLASSIFICATION_VERSION_REFRESH_SECONDS", "30"))
+CLASSIFICATION_CACHE_TTL_SECONDS = float(os.getenv("CLASSIFICATION_CACHE_TTL_SECONDS", "86400"))
+CLASSIFICATION_CACHE_MAX_ENTRIES = int(os.getenv("CLASSIFICATION_CACHE_MAX_ENTRIES", "4096"))
+
+# Near-duplicate detection, off by default. With ML_REQUEST_EMBEDDINGS=true and
+# ML_API_FORMAT=binary the classifier also returns an image embedding when its model can produce
+# one. Those requests bypass the classifier's cascade and run on its full model. The most
+# recent EMBEDDING_INDEX_MAX_ENTRIES are kept in memory, and a new report at least
+# DUPLICATE_SIMILARITY_THRESHOLD (cosine) similar to one of them is marked as its duplicate
+ML_REQUEST_EMBEDDINGS = os.getenv("ML_REQUEST_EMBEDDINGS", "false").lower() == "true"
+EMBEDDING_INDEX_MAX_ENTRIES = int(os.getenv("EMBEDDING_INDEX_MAX_ENTRIES", "50000"))
+DUPLICATE_SIMILARITY_THRESHOLD = float(os.getenv("DUPLICATE_SIMILARITY_THRESHOLD", "0.92"))
+# Each index refresh re-reads embeddings written this long before the newest one it has seen, to
+# catch transactions that committed out of order; keep it above the longest report transaction
+EMBEDDING_REFRESH_OVERLAP_SECONDS = float(os.getenv("EMBEDDING_REFRESH_OVERLAP_SECONDS", "60"))
+
+# Background image processing. When enabled, POST /reports/ returns straight away and a worker
+# (python -m app.utils.image_jobs, or IMAGE_JOB_WORKER=inline) uploads and classifies the image
+ASYNC_IMAGE_PROCESSING = os.getenv("ASYNC_IMAGE_PROCESSING", "false").lower() == "true"
+IMAGE_JOB_WORKER = os.getenv("IMAGE_JOB_WORKER", "")  # "inline" runs the worker inside the API process
+IMAGE_JOB_PROCESSOR = os.getenv("IMAGE_JOB_PROCESSOR", "s3")  # "memory" uses the in-memory stand-in
+IMAGE_JOB_MAX_ATTEMPTS = int(os.getenv("IMAGE_JOB_MAX_ATTEMPTS", "5"))
+IMAGE_JOB_BACKOFF_SECONDS = float(os.getenv("IMAGE_JOB_BACKOFF_SECONDS", "5"))
+IMAGE_JOB_MAX_BACKOFF_SECONDS = float(os.getenv("IMAGE_JOB_MAX_BACKOFF_SECONDS", "300"))
+IMAGE_JOB_POLL_SECONDS = float(os.getenv("IMAGE_JOB_POLL_SECONDS", "2"))
+
 class Settings:
     API_V1_STR = API_V1_STR
     PROJECT_NAME = PROJECT_NAME
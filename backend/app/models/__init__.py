@@ -4,3 +4,4 @@ from app.models.report import Report, ReportStatus
 from app.models.vote import Vote
 from app.models.comment import Comment
 from app.models.chat import ChatRoom, ChatMessage
+from app.models.report_image_job import ReportImageJob, ImageJobStatus
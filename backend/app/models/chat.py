@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -27,4 +27,8 @@ class ChatMessage(Base):
     
     # Relationships
     room = relationship("ChatRoom", back_populates="messages")
-    user = relationship("User", back_populates="chat_messages") 
\ No newline at end of file
+    user = relationship("User", back_populates="chat_messages")
+
+    __table_args__ = (
+        Index("ix_chat_messages_room_id_created_at_id", "room_id", "created_at", "id"),
+    ) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -16,4 +16,8 @@ class Comment(Base):
     
     # Relationships
     user = relationship("User", back_populates="comments")
-    report = relationship("Report", back_populates="comments") 
\ No newline at end of file
+    report = relationship("Report", back_populates="comments")
+
+    __table_args__ = (
+        Index("ix_comments_report_id_created_at_id", "report_id", "created_at", "id"),
+    ) 
\ No newline at end of file
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Enum, Text, Index, LargeBinary
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -6,6 +6,7 @@ import enum
 
 
 class ReportStatus(str, enum.Enum):
+    PROCESSING = "processing"  # Image upload/classification still running in the background
     PENDING = "pending"
     IN_PROGRESS = "in_progress"
     COMPLETED = "completed"
@@ -21,11 +22,40 @@ class Report(Base):
     type = Column(String, nullable=False)
     status = Column(String, nullable=False, default=ReportStatus.PENDING)
     image_url = Column(String, nullable=True)
+    model_version = Column(String, nullable=True)  # Classifier version that set the type, if any
+    # Image embedding from the classifier (float16 bytes, see app.utils.similarity), when it was
+    # written (the similarity index refreshes by this, not by ID) and the earlier report it was
+    # found to duplicate at ingest
+    embedding = Column(LargeBinary, nullable=True)
+    embedding_updated_at = Column(DateTime(timezone=True), nullable=True, index=True)
+    duplicate_of_id = Column(Integer, ForeignKey("reports.id", ondelete="SET NULL"), nullable=True)
     location = Column(String, nullable=True)
+    # Denormalized counters, kept in step by the vote/comment endpoints and
+    # re-derived by app.utils.report_counters when they drift
+    vote_count = Column(Integer, nullable=False, default=0, server_default="0")
+    comment_count = Column(Integer, nullable=False, default=0, server_default="0")
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     # Relationships
     user = relationship("User", back_populates="reports")
     votes = relationship("Vote", back_populates="report", cascade="all, delete-orphan")
-    comments = relationship("Comment", back_populates="report", cascade="all, delete-orphan") 
\ No newline at end of file
+    comments = relationship("Comment", back_populates="report", cascade="all, delete-orphan")
+
+    # Indexes matching the feed queries (see migration 5e1a9c3d7f20)
+    __table_args__ = (
+        Index("ix_reports_created_at_id", "created_at", "id"),
+        Index("ix_reports_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_reports_user_id_created_at_id", "user_id", "created_at", "id"),
+    )
+
+
+# Admin feed filters on the case-insensitive report type, with and without a status
+Index(
+    "ix_reports_lower_type_created_at_id",
+    func.lower(Report.type), Report.created_at, Report.id,
+)
+Index(
+    "ix_reports_lower_type_status_created_at_id",
+    func.lower(Report.type), Report.status, Report.created_at, Report.id,
+) 
\ No newline at end of file
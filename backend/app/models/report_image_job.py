@@ -0,0 +1,36 @@
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Text, Index
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.db.database import Base
+import enum
+
+
+class ImageJobStatus(str, enum.Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+class ReportImageJob(Base):
+    __tablename__ = "report_image_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_id = Column(Integer, ForeignKey("reports.id", ondelete="CASCADE"), nullable=False)
+    base64_image = Column(Text, nullable=True)  # Cleared once the job finishes
+    image_type = Column(String, nullable=False)
+    fallback_type = Column(String, nullable=True)  # User-provided type, used if classification fails
+    status = Column(String, nullable=False, default=ImageJobStatus.PENDING.value)
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    # Relationships
+    report = relationship("Report")
+
+    # Workers poll for due pending jobs
+    __table_args__ = (
+        Index("ix_report_image_jobs_status_next_attempt_at", "status", "next_attempt_at"),
+    )
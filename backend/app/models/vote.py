@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint
+from sqlalchemy import Column, Integer, ForeignKey, DateTime, UniqueConstraint, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -15,6 +15,8 @@ class Vote(Base):
     # Ensure a user can only vote once per report
     __table_args__ = (
         UniqueConstraint('user_id', 'report_id', name='uix_user_report_vote'),
+        # Per-report vote lookups; the unique constraint leads with user_id and can't serve them
+        Index('ix_votes_report_id_user_id', 'report_id', 'user_id'),
     )
     
     # Relationships
@@ -36,9 +36,12 @@ class Report(ReportBase):
     user_id: int
     status: str
     image_url: Optional[str] = None
+    model_version: Optional[str] = None
+    duplicate_of_id: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
-    vote_count: int = 0  # Will be calculated in the API
+    vote_count: int = 0
+    comment_count: int = 0
 
     class Config:
         from_attributes = True
@@ -51,6 +54,10 @@ class ReportWithVotes(Report):
         from_attributes = True 
 
 
+class SimilarReport(ReportWithVotes):
+    similarity: float  # Cosine similarity of the image embeddings
+
+
 class ReportStatus(str, Enum):
     PENDING = "pending"
     IN_PROGRESS = "in_progress"  # Renamed from ACCEPTED
@@ -0,0 +1,382 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+from app.core.config import CACHE_URL, REPORT_CACHE_TTL_SECONDS, REPORT_CACHE_MAX_ENTRIES
+import json
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class CacheBackend(ABC):
+    """
+    Interface for cache storage. Values must be JSON-serializable so the same
+    callers work against the in-process backend and a shared one.
+    """
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[Any]:
+        ...
+
+    @abstractmethod
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        ...
+
+    @abstractmethod
+    async def delete(self, key: str) -> None:
+        ...
+
+    @abstractmethod
+    async def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    async def incr(self, key: str, ttl: float) -> int:
+        """
+        Atomically add 1 to an integer counter (missing counts as 0), reset its TTL and return it.
+        """
+
+
+class InMemoryCache(CacheBackend):
+    """
+    Per-process cache with a TTL per entry and LRU eviction past `max_entries`.
+    Also serves as the local stand-in for the shared backend.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        self._entries[key] = (time.monotonic() + ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str) -> None:
+        self._entries.pop(key, None)
+
+    async def clear(self) -> None:
+        self._entries.clear()
+
+    async def incr(self, key: str, ttl: float) -> int:
+        # No await in between, so this is atomic on the event loop
+        value = (await self.get(key) or 0) + 1
+        await self.set(key, value, ttl)
+        return value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisCache(CacheBackend):
+    """
+    Shared cache backed by Redis, so every Lambda instance sees the same
+    entries and invalidations. Redis handles TTL and LRU (maxmemory-policy).
+    """
+
+    def __init__(self, url: str, prefix: str = "civicmirror:"):
+        import redis.asyncio as redis  # Optional dependency, only needed when CACHE_URL is set
+
+        self.prefix = prefix
+        self._client = redis.from_url(url)
+
+    async def get(self, key: str) -> Optional[Any]:
+        raw = await self._client.get(self.prefix + key)
+        return json.loads(raw) if raw is not None else None
+
+    async def set(self, key: str, value: Any, ttl: float) -> None:
+        await self._client.set(self.prefix + key, json.dumps(value), px=int(ttl * 1000))
+
+    async def delete(self, key: str) -> None:
+        await self._client.delete(self.prefix + key)
+
+    async def clear(self) -> None:
+        async for key in self._client.scan_iter(match=self.prefix + "*"):
+            await self._client.delete(key)
+
+    async def incr(self, key: str, ttl: float) -> int:
+        async with self._client.pipeline(transaction=True) as pipe:
+            value, _ = await pipe.incr(self.prefix + key).pexpire(self.prefix + key, int(ttl * 1000)).execute()
+        return int(value)
+
+
+def create_cache_backend(url: Optional[str] = None, max_entries: int = 1024) -> CacheBackend:
+    """
+    Build the configured backend: Redis when a redis:// URL is given,
+    the in-process cache otherwise or if Redis can't be set up.
+    """
+    if url and url.startswith(("redis://", "rediss://")):
+        try:
+            backend = RedisCache(url)
+            logger.info("Using Redis cache backend")
+            return backend
+        except Exception as e:
+            logger.error(f"Failed to initialize Redis cache, falling back to in-process cache: {str(e)}")
+    return InMemoryCache(max_entries=max_entries)
+
+
+class CountingCache:
+    """
+    Wraps a backend with a TTL and hit/miss/invalidation counters so a cache can be sized.
+    Backend errors are logged and treated as misses; a TTL of 0 disables the cache.
+    """
+
+    name = "cache"
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    async def _get(self, key: str, is_valid: Optional[Callable[[Any], bool]] = None) -> Optional[Any]:
+        if self.ttl <= 0:
+            return None
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            logger.error(f"{self.name} read failed: {str(e)}")
+            value = None
+        if value is not None and is_valid is not None and not is_valid(value):
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def _set(self, key: str, value: Any) -> None:
+        if self.ttl <= 0:
+            return
+        try:
+            await self.backend.set(key, value, self.ttl)
+        except Exception as e:
+            logger.error(f"{self.name} write failed: {str(e)}")
+
+    async def _delete(self, key: str) -> None:
+        self.invalidations += 1
+        try:
+            await self.backend.delete(key)
+        except Exception as e:
+            logger.error(f"{self.name} invalidation failed for {key}: {str(e)}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        stats = {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
+        if isinstance(self.backend, InMemoryCache):
+            stats["entries"] = len(self.backend)
+            stats["max_entries"] = self.backend.max_entries
+        return stats
+
+
+class ReportCache(CountingCache):
+    """
+    Read-through cache for single-report responses, keyed by report ID.
+
+    Each report has a generation counter that invalidate() bumps, and every
+    entry records the generation it was read under. A reader captures the
+    generation before its DB read, so if a write commits and invalidates in
+    between, the entry it stores afterwards carries the old generation and
+    is ignored rather than serving stale counts for the whole TTL.
+    """
+
+    name = "Report cache"
+
+    def _generation_key(self, report_id: int) -> str:
+        return f"report-generation:{report_id}"
+
+    async def generation(self, report_id: int) -> Optional[int]:
+        """
+        Current generation of a report, to pass to get() and set(). None if
+        it can't be read, in which case the cache is skipped for this request.
+        """
+        if self.ttl <= 0:
+            return None
+        try:
+            return await self.backend.get(self._generation_key(report_id)) or 0
+        except Exception as e:
+            logger.error(f"{self.name} read failed: {str(e)}")
+            return None
+
+    async def get(self, report_id: int, generation: Optional[int]) -> Optional[dict]:
+        if generation is None:
+            return None
+        entry = await self._get(f"report:{report_id}", lambda entry: entry.get("generation") == generation)
+        return entry["value"] if entry is not None else None
+
+    async def set(self, report_id: int, value: dict, generation: Optional[int]) -> None:
+        if generation is None:
+            return
+        await self._set(f"report:{report_id}", {"generation": generation, "value": value})
+
+    async def invalidate(self, report_id: int) -> None:
+        if self.ttl > 0:
+            try:
+                # Outlives any entry written under the previous generation
+                await self.backend.incr(self._generation_key(report_id), self.ttl * 2)
+            except Exception as e:
+                logger.error(f"{self.name} invalidation failed for report {report_id}: {str(e)}")
+        await self._delete(f"report:{report_id}")
+
+
+class ClassificationCache(CountingCache):
+    """
+    Classifier results keyed by image content hash and model version.
+
+    The model version is part of the key, so once the current version
+    changes every entry from the old model stops matching and ages out. The
+    current version lives in the shared backend, so every instance switches
+    together, and each instance re-reads it at most `version_refresh`
+    seconds apart. It is learned two ways:
+
+    - `fetch_version` (e.g. polling the classifier's GET /models) is called
+      on each refresh and is authoritative when it answers, so a deploy is
+      picked up even while every lookup is a hit;
+    - otherwise the version on ML responses (observe()) replaces it, once
+      every response for longer than `version_refresh` seconds has come from
+      the new version. During a canary split primary responses keep resetting
+      that clock, so the version stays put instead of flipping back and forth
+      and emptying the cache; a canary promoted to 100% takes over after one
+      refresh window.
+
+    Only predictions made by the current version are stored, so results from
+    a canary model never land under the primary's key.
+    """
+
+    name = "Classification cache"
+    version_key = "classification-model-version"
+
+    def __init__(
+        self,
+        backend: CacheBackend,
+        ttl: float,
+        model_version: Optional[str] = None,
+        version_refresh: float = 30.0,
+        fetch_version: Optional[Callable[[], Awaitable[Optional[str]]]] = None,
+    ):
+        super().__init__(backend, ttl)
+        self.default_version = model_version or "unknown"
+        self.model_version = self.default_version
+        self.version_refresh = version_refresh
+        self.fetch_version = fetch_version
+        self._version_checked_at: Optional[float] = None
+        # A different version seen on responses, and when it was first seen uninterrupted
+        self._pending_version: Optional[str] = None
+        self._pending_since = 0.0
+        self.version_changes = 0
+
+    def _key(self, version: str, content_hash: str) -> str:
+        return f"classification:{version}:{content_hash}"
+
+    def _use_version(self, version: str) -> None:
+        if version != self.model_version:
+            logger.info(f"Model version changed from {self.model_version} to {version}, invalidating classification cache")
+            self.model_version = version
+            self.version_changes += 1
+
+    async def _publish_version(self, version: str) -> None:
+        try:
+            # Kept as long as the entries it names
+            await self.backend.set(self.version_key, version, max(self.ttl, 1.0))
+        except Exception as e:
+            logger.error(f"{self.name} version write failed: {str(e)}")
+        self._use_version(version)
+
+    async def current_version(self) -> str:
+        """
+        The version to read and write entries under, refreshed from the
+        classifier or the shared backend every `version_refresh` seconds.
+        """
+        now = time.monotonic()
+        if self._version_checked_at is not None and now - self._version_checked_at < self.version_refresh:
+            return self.model_version
+        self._version_checked_at = now
+
+        if self.fetch_version is not None:
+            try:
+                version = await self.fetch_version()
+            except Exception as e:
+                logger.warning(f"Could not fetch the classifier's model version: {str(e)}")
+                version = None
+            if version:
+                if version != self.model_version:
+                    await self._publish_version(version)
+                return self.model_version
+        try:
+            version = await self.backend.get(self.version_key)
+        except Exception as e:
+            logger.error(f"{self.name} version read failed: {str(e)}")
+            version = None
+        self._use_version(version or self.model_version)
+        return self.model_version
+
+    async def observe(self, version: Optional[str]) -> None:
+        """
+        Record the model version an ML response came from. Without
+        `fetch_version` a different version becomes the current one for all
+        instances once it has been the only one seen for `version_refresh`
+        seconds; with it, /models decides, so a canary can't flip the key.
+        """
+        if not version or self.fetch_version is not None:
+            return
+        current = await self.current_version()
+        if version == current:
+            self._pending_version = None
+            return
+        now = time.monotonic()
+        if current == "unknown":
+            # Nothing cached under a version yet, so nothing to protect
+            await self._publish_version(version)
+        elif version != self._pending_version:
+            self._pending_version = version
+            self._pending_since = now
+        elif now - self._pending_since >= self.version_refresh:
+            self._pending_version = None
+            await self._publish_version(version)
+
+    async def get(self, content_hash: str) -> Optional[dict]:
+        if self.ttl <= 0:
+            return None
+        return await self._get(self._key(await self.current_version(), content_hash))
+
+    async def set(self, content_hash: str, prediction: dict) -> None:
+        if self.ttl <= 0:
+            return
+        version = prediction.get("model_version") or self.default_version
+        await self.observe(prediction.get("model_version"))
+        if version == await self.current_version():
+            await self._set(self._key(version, content_hash), prediction)
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats["model_version"] = self.model_version
+        stats["version_changes"] = self.version_changes
+        stats["version_source"] = "classifier" if self.fetch_version else "responses"
+        return stats
+
+
+report_cache = ReportCache(
+    create_cache_backend(CACHE_URL, max_entries=REPORT_CACHE_MAX_ENTRIES),
+    ttl=REPORT_CACHE_TTL_SECONDS,
+)
@@ -0,0 +1,244 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import or_
+from app.db.database import async_session_factory
+from app.models.report import Report, ReportStatus
+from app.models.report_image_job import ReportImageJob, ImageJobStatus
+from app.utils.report_images import ProcessedImage, process_report_image, normalize_report_type
+from app.utils.similarity import report_similarity_index, encode_embedding
+from app.utils.cache import report_cache
+from app.core.config import (
+    IMAGE_JOB_PROCESSOR,
+    IMAGE_JOB_MAX_ATTEMPTS,
+    IMAGE_JOB_BACKOFF_SECONDS,
+    IMAGE_JOB_MAX_BACKOFF_SECONDS,
+    IMAGE_JOB_POLL_SECONDS,
+    S3_UPLOAD_TIMEOUT_SECONDS,
+    ML_CLASSIFY_TIMEOUT_SECONDS,
+)
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, Optional
+from uuid import uuid4
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# (base64_image, image_type, fallback_type) -> ProcessedImage
+ImageProcessor = Callable[[str, str, Optional[str]], Awaitable[ProcessedImage]]
+
+# How long a claimed job stays invisible to other workers. If the worker dies
+# mid-job the lease runs out and another worker picks the job up again.
+JOB_LEASE_SECONDS = S3_UPLOAD_TIMEOUT_SECONDS + ML_CLASSIFY_TIMEOUT_SECONDS + 30
+
+
+def enqueue_image_job(
+    db: AsyncSession, report_id: int, base64_image: str, image_type: str, fallback_type: Optional[str]
+) -> ReportImageJob:
+    """
+    Add an image job for a report to the session.
+    It is committed together with the report, so a report is never left without its job.
+    """
+    job = ReportImageJob(
+        report_id=report_id,
+        base64_image=base64_image,
+        image_type=image_type,
+        fallback_type=fallback_type,
+        status=ImageJobStatus.PENDING.value,
+        attempts=0,
+    )
+    db.add(job)
+    return job
+
+
+def retry_delay(attempts: int) -> float:
+    """
+    Exponential backoff for the given attempt number, capped at IMAGE_JOB_MAX_BACKOFF_SECONDS.
+    """
+    return min(IMAGE_JOB_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0)), IMAGE_JOB_MAX_BACKOFF_SECONDS)
+
+
+class InMemoryImageProcessor:
+    """
+    Stand-in for S3 and the classifier so the pipeline runs without AWS or the model.
+    Images are kept in memory and the user-provided type is used as the classification.
+    """
+
+    def __init__(self):
+        self.images: Dict[str, str] = {}
+
+    async def __call__(
+        self, base64_image: str, image_type: str, fallback_type: Optional[str]
+    ) -> ProcessedImage:
+        key = f"reports/{uuid4().hex}.{image_type}"
+        self.images[key] = base64_image
+        return ProcessedImage(f"memory://{key}", fallback_type or "miscellaneous")
+
+
+def get_image_processor() -> ImageProcessor:
+    """
+    The processor selected by IMAGE_JOB_PROCESSOR.
+    """
+    if IMAGE_JOB_PROCESSOR == "memory":
+        return InMemoryImageProcessor()
+    return process_report_image
+
+
+class ImageJobWorker:
+    """
+    Polls the report_image_jobs table, uploads and classifies each image, and
+    fills in the report's image_url and type. Failed jobs are retried with
+    exponential backoff; after max_attempts the report is released with the
+    user-provided type and no image.
+    """
+
+    def __init__(
+        self,
+        processor: Optional[ImageProcessor] = None,
+        session_factory=async_session_factory,
+        max_attempts: int = IMAGE_JOB_MAX_ATTEMPTS,
+        poll_interval: float = IMAGE_JOB_POLL_SECONDS,
+    ):
+        self.processor = processor or get_image_processor()
+        self.session_factory = session_factory
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._stopping = False
+
+    async def claim_job(self, db: AsyncSession) -> Optional[ReportImageJob]:
+        """
+        Claim the next due job. Pending jobs and running jobs whose lease
+        expired are both eligible; SKIP LOCKED lets several workers poll at once.
+        """
+        now = datetime.now(timezone.utc)
+        result = await db.execute(
+            select(ReportImageJob)
+            .where(
+                or_(
+                    ReportImageJob.status == ImageJobStatus.PENDING.value,
+                    ReportImageJob.status == ImageJobStatus.RUNNING.value,
+                ),
+                ReportImageJob.next_attempt_at <= now,
+            )
+            .order_by(ReportImageJob.next_attempt_at, ReportImageJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        )
+        job = result.scalar_one_or_none()
+        if not job:
+            return None
+
+        job.status = ImageJobStatus.RUNNING.value
+        job.attempts += 1
+        job.next_attempt_at = now + timedelta(seconds=JOB_LEASE_SECONDS)
+        await db.commit()
+        return job
+
+    async def run_job(self, db: AsyncSession, job: ReportImageJob) -> bool:
+        """
+        Process a claimed job. Returns True if it completed.
+        """
+        logger.info(f"Processing image job {job.id} for report {job.report_id} (attempt {job.attempts})")
+        try:
+            processed = await self.processor(job.base64_image, job.image_type, job.fallback_type)
+            if not processed.image_url:
+                raise RuntimeError("Image upload failed")
+        except Exception as e:
+            await self._handle_failure(db, job, str(e))
+            return False
+
+        await self._release_report(db, job.report_id, processed)
+        job.status = ImageJobStatus.DONE.value
+        job.base64_image = None
+        job.last_error = None
+        await db.commit()
+        await report_cache.invalidate(job.report_id)
+        logger.info(
+            f"Image job {job.id} done: report {job.report_id} "
+            f"type={processed.report_type}, image_url={processed.image_url}"
+        )
+        return True
+
+    async def _handle_failure(self, db: AsyncSession, job: ReportImageJob, error: str) -> None:
+        job.last_error = error
+        if job.attempts >= self.max_attempts:
+            logger.error(f"Image job {job.id} failed permanently after {job.attempts} attempts: {error}")
+            job.status = ImageJobStatus.FAILED.value
+            job.base64_image = None
+            await self._release_report(db, job.report_id, ProcessedImage(None, job.fallback_type))
+            await db.commit()
+            await report_cache.invalidate(job.report_id)
+            return
+
+        delay = retry_delay(job.attempts)
+        logger.warning(f"Image job {job.id} attempt {job.attempts} failed, retrying in {delay}s: {error}")
+        job.status = ImageJobStatus.PENDING.value
+        job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=delay)
+        await db.commit()
+
+    async def _release_report(self, db: AsyncSession, report_id: int, processed: ProcessedImage) -> None:
+        """
+        Fill in the processed fields and move the report from processing to pending.
+        """
+        result = await db.execute(select(Report).where(Report.id == report_id))
+        report = result.scalar_one_or_none()
+        if not report:
+            return
+        if processed.image_url:
+            report.image_url = processed.image_url
+        report.type = normalize_report_type(processed.report_type)
+        report.model_version = processed.model_version
+        if processed.embedding:
+            report.embedding = encode_embedding(processed.embedding)
+            report.embedding_updated_at = datetime.now(timezone.utc)
+            report.duplicate_of_id = await report_similarity_index.find_duplicate(
+                db, processed.model_version, processed.embedding
+            )
+        if report.status == ReportStatus.PROCESSING.value:
+            report.status = ReportStatus.PENDING.value
+
+    async def run_once(self) -> bool:
+        """
+        Claim and process at most one job. Returns True if a job was found.
+        """
+        async with self.session_factory() as db:
+            job = await self.claim_job(db)
+            if not job:
+                return False
+            await self.run_job(db, job)
+            return True
+
+    async def run_forever(self) -> None:
+        logger.info("Image job worker started")
+        while not self._stopping:
+            try:
+                found = await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Image job worker error: {str(e)}", exc_info=True)
+                found = False
+            if not found:
+                await asyncio.sleep(self.poll_interval)
+        logger.info("Image job worker stopped")
+
+    def stop(self) -> None:
+        self._stopping = True
+
+
+if __name__ == "__main__":
+    # Local worker process (from backend/): python -m app.utils.image_jobs [--once]
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Process queued report image jobs.")
+    parser.add_argument("--once", action="store_true", help="drain the due jobs and exit")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    worker = ImageJobWorker()
+
+    async def _drain() -> None:
+        while await worker.run_once():
+            pass
+
+    asyncio.run(_drain() if args.once else worker.run_forever())
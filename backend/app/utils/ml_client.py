@@ -1,65 +1,295 @@
 import httpx
+import asyncio
+import base64
+import hashlib
 import logging
-import json
-from typing import Optional
+import time
+from typing import Any, Optional
+from app.core.config import (
+    ML_API_URL,
+    ML_API_FORMAT,
+    ML_REQUEST_EMBEDDINGS,
+    ML_HTTP_TIMEOUT_SECONDS,
+    ML_HTTP_CONNECT_TIMEOUT_SECONDS,
+    ML_HTTP_MAX_CONNECTIONS,
+    ML_HTTP_MAX_KEEPALIVE,
+    ML_BREAKER_FAILURE_THRESHOLD,
+    ML_BREAKER_RECOVERY_SECONDS,
+    ML_MODEL_VERSION,
+    ML_MODELS_URL,
+    CLASSIFICATION_VERSION_REFRESH_SECONDS,
+    CACHE_URL,
+    CLASSIFICATION_CACHE_TTL_SECONDS,
+    CLASSIFICATION_CACHE_MAX_ENTRIES,
+)
+from app.utils.cache import ClassificationCache, create_cache_backend
 
 logger = logging.getLogger(__name__)
 
-# API URL for your Hugging Face model
-MODEL_API_URL = "https://your-username-civic-mirror-classifier.hf.space/api/predict"  # Update with your actual URL
+# API URL for your Hugging Face model (set ML_API_URL)
+MODEL_API_URL = ML_API_URL
 
-async def classify_image(base64_image: str) -> Optional[str]:
+
+class CircuitBreaker:
     """
-    Sends a base64-encoded image to the ML API and returns the classification result.
-    
-    Args:
-        base64_image: Base64-encoded image string
-    
+    Stops calling the ML API after repeated failures.
+
+    closed    - calls go through; `failure_threshold` consecutive failures open the circuit
+    open      - calls fail fast until `recovery_timeout` has passed
+    half_open - one probe call is let through; success closes the circuit, failure re-opens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        # Transition counters, e.g. {"closed->open": 2}, for alerting
+        self.transitions = {}
+        self.rejected_calls = 0
+
+    def _transition(self, new_state: str) -> None:
+        if new_state == self.state:
+            return
+        key = f"{self.state}->{new_state}"
+        self.transitions[key] = self.transitions.get(key, 0) + 1
+        logger.warning(f"ML circuit breaker {key}")
+        self.state = new_state
+
+    def allow_request(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.recovery_timeout:
+                self.rejected_calls += 1
+                return False
+            self._transition(self.HALF_OPEN)
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected_calls += 1
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def record_success(self) -> None:
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self._transition(self.CLOSED)
+
+    def record_failure(self) -> None:
+        self._probe_in_flight = False
+        self.consecutive_failures += 1
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+            self._transition(self.OPEN)
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "rejected_calls": self.rejected_calls,
+            "transitions": dict(self.transitions),
+        }
+
+
+circuit_breaker = CircuitBreaker(
+    failure_threshold=ML_BREAKER_FAILURE_THRESHOLD,
+    recovery_timeout=ML_BREAKER_RECOVERY_SECONDS,
+)
+
+
+
+async def fetch_primary_model_version() -> Optional[str]:
+    """
+    Version the classifier service serves by default, from its GET /models.
+    """
+    response = await get_http_client().get(ML_MODELS_URL, timeout=ML_HTTP_CONNECT_TIMEOUT_SECONDS)
+    response.raise_for_status()
+    return (response.json().get("primary") or {}).get("version")
+
+
+classification_cache = ClassificationCache(
+    create_cache_backend(CACHE_URL, max_entries=CLASSIFICATION_CACHE_MAX_ENTRIES),
+    ttl=CLASSIFICATION_CACHE_TTL_SECONDS,
+    model_version=ML_MODEL_VERSION,
+    version_refresh=CLASSIFICATION_VERSION_REFRESH_SECONDS,
+    fetch_version=fetch_primary_model_version if ML_MODELS_URL else None,
+)
+
+# Shared client so connections to the model host are kept alive between calls
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    Return the pooled ML API client, creating it on first use.
+    """
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(ML_HTTP_TIMEOUT_SECONDS, connect=ML_HTTP_CONNECT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(
+                max_connections=ML_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=ML_HTTP_MAX_KEEPALIVE,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client() -> None:
+    """
+    Close the pooled client. Called on app shutdown.
+    """
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+def image_content_hash(image_bytes: bytes) -> str:
+    """
+    SHA-256 of the decoded image bytes, so the same photo hashes the same
+    regardless of data-URL prefix or base64 line wrapping.
+    """
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+def _parse_prediction(result: Any) -> Optional[dict]:
+    """
+    Pull label, confidence and model version out of an ML API response.
+    """
+    if isinstance(result, dict) and "data" in result:
+        # The model returns classification results in order of confidence
+        top = result["data"][0]
+        return {
+            "label": top["label"],
+            "confidence": top.get("confidence", top.get("score")),
+            "model_version": result.get("model_version"),
+        }
+    if isinstance(result, dict) and "predicted_class" in result:
+        # Classifier service (ai/main.py) response
+        return {
+            "label": result["predicted_class"],
+            "confidence": result.get("confidence"),
+            "model_version": result.get("model_version"),
+            "embedding": result.get("embedding"),
+        }
+    return None
+
+
+async def _post_image(base64_content: str, image_bytes: Optional[bytes]) -> httpx.Response:
+    """
+    Send the image to the ML API in the configured format. The binary format
+    skips re-encoding and is a third smaller on the wire.
+    """
+    if ML_API_FORMAT == "binary" and image_bytes is not None:
+        return await get_http_client().post(
+            MODEL_API_URL,
+            params={"include_embedding": "true"} if ML_REQUEST_EMBEDDINGS else None,
+            content=image_bytes,
+            headers={"Content-Type": "application/octet-stream"}
+        )
+
+    # Prepare the payload
+    payload = {
+        "data": [base64_content]
+    }
+    return await get_http_client().post(
+        MODEL_API_URL,
+        json=payload,
+        headers={"Content-Type": "application/json"}
+    )
+
+
+async def classify_image_detailed(base64_image: str) -> Optional[dict]:
+    """
+    Classify an image and return {"label", "confidence", "model_version"}, plus
+    "embedding" when the classifier service provides one.
+
+    Results are cached by content hash and model version, so a photo that was
+    already classified by the current model is answered without an API call.
+
     Returns:
-        Classification result or None if an error occurs
+        The prediction, or None if an error occurs or the circuit breaker is open
     """
+    # Extract the base64 content (remove prefix if present)
+    if "base64," in base64_image:
+        base64_content = base64_image.split("base64,")[1]
+    else:
+        base64_content = base64_image
+
+    # Decode once: the bytes are both hashed for the cache and, in binary mode, sent as-is
+    try:
+        image_bytes = base64.b64decode(base64_content)
+    except Exception:
+        image_bytes = None
+    content_hash = image_content_hash(image_bytes) if image_bytes is not None else None
+    if content_hash:
+        cached = await classification_cache.get(content_hash)
+        if cached is not None:
+            logger.info(f"ML classification cache hit: {cached['label']}")
+            return cached
+
+    if not circuit_breaker.allow_request():
+        logger.warning("ML circuit breaker is open, skipping classification")
+        return None
+
     try:
         logger.info("Sending image to ML API for classification")
+
+        # Make POST request to the ML API over the pooled client
+        response = await _post_image(base64_content, image_bytes)
         
-        # Extract the base64 content (remove prefix if present)
-        if "base64," in base64_image:
-            base64_content = base64_image.split("base64,")[1]
+        # Check if request was successful
+        if response.status_code == 200:
+            circuit_breaker.record_success()
+            prediction = _parse_prediction(response.json())
+            if prediction is None:
+                logger.error(f"Unexpected API response format: {response.text}")
+                return None
+
+            logger.info(f"ML classification result: {prediction['label']}")
+            if content_hash:
+                await classification_cache.set(content_hash, prediction)
+            return prediction
         else:
-            base64_content = base64_image
-            
-        # Prepare the payload
-        payload = {
-            "data": [base64_content]
-        }
-        
-        # Make POST request to the ML API
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            response = await client.post(
-                MODEL_API_URL,
-                json=payload,
-                headers={"Content-Type": "application/json"}
-            )
-            
-            # Check if request was successful
-            if response.status_code == 200:
-                result = response.json()
-                # Extract the top prediction from the model response
-                if isinstance(result, dict) and "data" in result:
-                    predictions = result["data"]
-                    # The model returns classification results in order of confidence
-                    top_prediction = predictions[0]["label"]
-                    logger.info(f"ML classification result: {top_prediction}")
-                    return top_prediction
-                else:
-                    logger.error(f"Unexpected API response format: {result}")
-                    return None
+            # 5xx and 429 mean the model host is struggling; other 4xx and 501 (a feature the
+            # model doesn't support) are our fault
+            if (response.status_code >= 500 and response.status_code != 501) or response.status_code == 429:
+                circuit_breaker.record_failure()
             else:
-                logger.error(f"API request failed with status code {response.status_code}: {response.text}")
-                return None
+                circuit_breaker.record_success()
+            logger.error(f"API request failed with status code {response.status_code}: {response.text}")
+            return None
                 
+    except asyncio.CancelledError:
+        # Cut off by the caller's timeout budget; count it so a hung model host opens the circuit
+        circuit_breaker.record_failure()
+        raise
     except Exception as e:
+        circuit_breaker.record_failure()
         logger.error(f"Error calling ML API: {str(e)}", exc_info=True)
         return None
+
+
+async def classify_image(base64_image: str) -> Optional[str]:
+    """
+    Sends a base64-encoded image to the ML API and returns the classification result.
+    
+    Args:
+        base64_image: Base64-encoded image string
+    
+    Returns:
+        Classification result or None if an error occurs or the circuit breaker is open
+        (callers then fall back to 'miscellaneous')
+    """
+    prediction = await classify_image_detailed(base64_image)
+    return prediction["label"] if prediction else None
+
         
 def map_classification_to_report_type(classification: str) -> str:
     """
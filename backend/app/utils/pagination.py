@@ -0,0 +1,67 @@
+from fastapi import HTTPException, Response, status
+from sqlalchemy import and_, or_, desc
+from datetime import datetime
+from typing import Any, Optional, Sequence, Tuple
+import base64
+import json
+
+# Response header carrying the cursor for the next page (absent on the last page)
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Encode a (created_at, id) position as an opaque, URL-safe cursor string.
+    """
+    payload = json.dumps({"c": created_at.isoformat(), "i": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor produced by encode_cursor.
+    Raises a 400 if the cursor is malformed.
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(payload["c"]), int(payload["i"])
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+
+def paginate(query, created_col, id_col, skip: int, limit: int, cursor: Optional[str] = None):
+    """
+    Order a query newest first on (created_at, id) and apply either keyset or offset paging.
+
+    When a cursor is given the page starts strictly after that position, so the
+    database can seek straight into a (created_at, id) index instead of
+    walking `skip` rows, and rows never shift between pages. Without a cursor
+    the old skip/limit behaviour is kept for existing clients.
+    """
+    if cursor:
+        cursor_created_at, cursor_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                created_col < cursor_created_at,
+                and_(created_col == cursor_created_at, id_col < cursor_id)
+            )
+        )
+    else:
+        query = query.offset(skip)
+
+    return query.order_by(desc(created_col), desc(id_col)).limit(limit)
+
+
+def set_next_cursor(response: Response, rows: Sequence[Any], limit: int) -> None:
+    """
+    Set the next-page cursor header from the last row of a full page.
+    `rows` are the model instances (anything with `created_at` and `id`).
+    """
+    if limit > 0 and len(rows) == limit:
+        last = rows[-1]
+        if last.created_at is not None:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(last.created_at, last.id)
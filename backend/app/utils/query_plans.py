@@ -0,0 +1,163 @@
+"""
+Check that every list endpoint's SQL is served by an index.
+
+Builds the same queries the routers run, EXPLAINs each one against the
+database in DATABASE_URL and exits non-zero if any plan contains a
+sequential scan. Sequential scans are disabled for the session, so a
+"Seq Scan" node only shows up when no index can serve the query at all,
+even on a small seeded database.
+
+Usage (from backend/):
+    python -m app.utils.query_plans            # check the current database
+    python -m app.utils.query_plans --seed 5000  # insert synthetic rows first
+"""
+from sqlalchemy.future import select
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from app.db.database import sync_engine
+from app.models.user import User
+from app.models.report import Report
+from app.models.vote import Vote
+from app.models.comment import Comment
+from app.models.chat import ChatRoom, ChatMessage
+from app.utils.pagination import paginate, encode_cursor
+from datetime import datetime, timezone
+from typing import Dict, List
+import argparse
+import json
+import logging
+import random
+import sys
+
+logger = logging.getLogger(__name__)
+
+# A cursor somewhere in the past, so keyset variants are exercised too
+SAMPLE_CURSOR = encode_cursor(datetime(2025, 1, 1, tzinfo=timezone.utc), 1000)
+
+
+def endpoint_queries() -> Dict[str, object]:
+    """
+    The SQL behind each list endpoint, keyed by a readable name.
+    Keep these in step with the routers when their queries change.
+    """
+    queries = {}
+    for label, cursor in (("offset", None), ("cursor", SAMPLE_CURSOR)):
+        queries[f"GET /reports [{label}]"] = paginate(
+            select(Report), Report.created_at, Report.id, 20, 10, cursor)
+        queries[f"GET /reports?status= [{label}]"] = paginate(
+            select(Report).where(Report.status == "pending"), Report.created_at, Report.id, 20, 10, cursor)
+        queries[f"GET /reports/me [{label}]"] = paginate(
+            select(Report).where(Report.user_id == 1), Report.created_at, Report.id, 20, 10, cursor)
+        queries[f"GET /admin/reports (role) [{label}]"] = paginate(
+            select(Report).where(func.lower(Report.type) == "garbage"), Report.created_at, Report.id, 0, 100, cursor)
+        queries[f"GET /admin/reports?status= (role) [{label}]"] = paginate(
+            select(Report).where(Report.status == "pending", func.lower(Report.type) == "garbage"),
+            Report.created_at, Report.id, 0, 100, cursor)
+        queries[f"GET /comments/report/{{id}} [{label}]"] = paginate(
+            select(Comment, User.username).join(User, Comment.user_id == User.id).where(Comment.report_id == 1),
+            Comment.created_at, Comment.id, 0, 100, cursor)
+        queries[f"GET /chat/rooms/{{id}}/messages [{label}]"] = paginate(
+            select(ChatMessage, User.username).join(User, ChatMessage.user_id == User.id).where(ChatMessage.room_id == 1),
+            ChatMessage.created_at, ChatMessage.id, 0, 50, cursor)
+
+    queries["report vote hydration"] = select(Vote.report_id, Vote.user_id) \
+        .where(Vote.report_id.in_(list(range(1, 101)))) \
+        .order_by(Vote.report_id, Vote.id)
+    return queries
+
+
+def find_seq_scans(plan: dict) -> List[str]:
+    """
+    Walk a JSON EXPLAIN plan and return the relations read by sequential scans.
+    """
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan.get("Relation Name", "?"))
+    for child in plan.get("Plans", []):
+        found.extend(find_seq_scans(child))
+    return found
+
+
+def seed(session: Session, report_count: int) -> None:
+    """
+    Insert synthetic users, reports, votes, comments and chat messages.
+    """
+    rng = random.Random(42)
+    suffix = rng.randrange(1_000_000)
+    user_ids = [
+        session.execute(insert(User).values(
+            email=f"seed{suffix}_{i}@example.com",
+            username=f"seed{suffix}_{i}",
+            hashed_password="x",
+        ).returning(User.id)).scalar_one()
+        for i in range(50)
+    ]
+    room_id = session.execute(insert(ChatRoom).values(
+        pin_code=f"seed{suffix}", name="Seed room"
+    ).returning(ChatRoom.id)).scalar_one()
+
+    types = ["garbage", "labour", "electrician", "plumber", "miscellaneous"]
+    statuses = ["pending", "in_progress", "completed"]
+    report_ids = session.execute(insert(Report).returning(Report.id), [
+        {
+            "user_id": rng.choice(user_ids),
+            "title": f"Seed report {i}",
+            "type": rng.choice(types),
+            "status": rng.choice(statuses),
+        }
+        for i in range(report_count)
+    ]).scalars().all()
+
+    votes = {(rng.choice(user_ids), rng.choice(report_ids)) for _ in range(report_count * 3)}
+    session.execute(insert(Vote), [{"user_id": u, "report_id": r} for u, r in votes])
+    session.execute(insert(Comment), [
+        {"user_id": rng.choice(user_ids), "report_id": rng.choice(report_ids), "text": "seed"}
+        for _ in range(report_count * 2)
+    ])
+    session.execute(insert(ChatMessage), [
+        {"room_id": room_id, "user_id": rng.choice(user_ids), "message": "seed"}
+        for _ in range(report_count)
+    ])
+    session.commit()
+    logger.info(f"Seeded {report_count} reports with votes, comments and chat messages")
+
+
+def check_plans() -> bool:
+    """
+    EXPLAIN every endpoint query and report any sequential scans.
+    Returns True when all plans are index-only or index scans.
+    """
+    ok = True
+    with sync_engine.connect() as conn:
+        conn.exec_driver_sql("SET enable_seqscan = off")
+        conn.exec_driver_sql("ANALYZE")
+        for name, query in endpoint_queries().items():
+            compiled = query.compile(dialect=conn.dialect)
+            row = conn.exec_driver_sql(
+                "EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params
+            ).scalar_one()
+            plan = (json.loads(row) if isinstance(row, str) else row)[0]["Plan"]
+            seq_scans = find_seq_scans(plan)
+            if seq_scans:
+                ok = False
+                print(f"FAIL  {name}: sequential scan on {', '.join(seq_scans)}")
+            else:
+                print(f"ok    {name}")
+    return ok
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fail if any endpoint query plans a sequential scan.")
+    parser.add_argument("--seed", type=int, default=0, help="insert this many synthetic reports first")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if sync_engine.dialect.name != "postgresql":
+        print("query_plans needs a PostgreSQL DATABASE_URL")
+        sys.exit(2)
+
+    if args.seed:
+        with Session(sync_engine) as session:
+            seed(session, args.seed)
+
+    sys.exit(0 if check_plans() else 1)
@@ -0,0 +1,80 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import func, update, or_
+from app.models.report import Report
+from app.models.vote import Vote
+from app.models.comment import Comment
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+async def adjust_vote_count(db: AsyncSession, report_id: int, delta: int = 1) -> None:
+    """
+    Atomically adjust a report's vote_count.
+    Runs in the caller's transaction, so it commits or rolls back with the vote itself.
+    """
+    await db.execute(
+        update(Report)
+        .where(Report.id == report_id)
+        .values(vote_count=Report.vote_count + delta)
+    )
+
+
+async def adjust_comment_count(db: AsyncSession, report_id: int, delta: int = 1) -> None:
+    """
+    Atomically adjust a report's comment_count.
+    Runs in the caller's transaction, so it commits or rolls back with the comment itself.
+    """
+    await db.execute(
+        update(Report)
+        .where(Report.id == report_id)
+        .values(comment_count=Report.comment_count + delta)
+    )
+
+
+async def reconcile_report_counters(db: AsyncSession) -> int:
+    """
+    Re-derive vote_count and comment_count for every report from the votes and
+    comments tables in one bulk UPDATE, touching only rows that have drifted.
+
+    Returns the number of reports that were corrected.
+    """
+    actual_votes = (
+        select(func.count(Vote.id))
+        .where(Vote.report_id == Report.id)
+        .scalar_subquery()
+    )
+    actual_comments = (
+        select(func.count(Comment.id))
+        .where(Comment.report_id == Report.id)
+        .scalar_subquery()
+    )
+
+    result = await db.execute(
+        update(Report)
+        .where(or_(Report.vote_count != actual_votes, Report.comment_count != actual_comments))
+        .values(vote_count=actual_votes, comment_count=actual_comments)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+    fixed = result.rowcount or 0
+    logger.info(f"Reconciled report counters, corrected {fixed} reports")
+    return fixed
+
+
+async def _main() -> None:
+    from app.db.database import async_session_factory
+
+    async with async_session_factory() as session:
+        fixed = await reconcile_report_counters(session)
+    print(f"Corrected counters on {fixed} reports")
+
+
+if __name__ == "__main__":
+    # Usage (from backend/): python -m app.utils.report_counters
+    import asyncio
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(_main())
@@ -0,0 +1,70 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from app.models.report import Report
+from app.models.vote import Vote
+from typing import Dict, List, Sequence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def report_to_dict(report: Report, vote_users: List[int]) -> dict:
+    """
+    Build the ReportWithVotes response dict for a report and its voters.
+    """
+    return {
+        "id": report.id,
+        "user_id": report.user_id,
+        "title": report.title,
+        "description": report.description,
+        "type": report.type,
+        "status": report.status,
+        "location": report.location,
+        "image_url": report.image_url,
+        "model_version": report.model_version,
+        "duplicate_of_id": report.duplicate_of_id,
+        "created_at": report.created_at,
+        "updated_at": report.updated_at,
+        "vote_count": report.vote_count,
+        "comment_count": report.comment_count,
+        "votes": vote_users
+    }
+
+
+async def load_votes_for_reports(db: AsyncSession, report_ids: Sequence[int]) -> Dict[int, List[int]]:
+    """
+    Load the voter user IDs for a whole page of reports in a single query.
+
+    Returns a mapping of report ID to the list of user IDs who voted for it.
+    Reports without votes map to an empty list.
+    """
+    votes_by_report: Dict[int, List[int]] = {report_id: [] for report_id in report_ids}
+    if not votes_by_report:
+        return votes_by_report
+
+    result = await db.execute(
+        select(Vote.report_id, Vote.user_id)
+        .where(Vote.report_id.in_(list(votes_by_report)))
+        .order_by(Vote.report_id, Vote.id)
+    )
+    for report_id, user_id in result:
+        votes_by_report[report_id].append(user_id)
+
+    return votes_by_report
+
+
+async def hydrate_reports(db: AsyncSession, reports: Sequence[Report]) -> List[dict]:
+    """
+    Attach voter IDs to a page of reports. Counts come from the denormalized
+    counter columns, so this costs one query for the whole page.
+    """
+    votes_by_report = await load_votes_for_reports(db, [report.id for report in reports])
+    return [report_to_dict(report, votes_by_report[report.id]) for report in reports]
+
+
+async def hydrate_report(db: AsyncSession, report: Report) -> dict:
+    """
+    Attach voter IDs to a single report.
+    """
+    hydrated = await hydrate_reports(db, [report])
+    return hydrated[0]
@@ -0,0 +1,105 @@
+from app.utils.s3 import upload_base64_image_to_s3
+from app.utils.ml_client import classify_image_detailed, map_classification_to_report_type
+from app.core.config import S3_UPLOAD_TIMEOUT_SECONDS, ML_CLASSIFY_TIMEOUT_SECONDS
+from typing import List, NamedTuple, Optional, Tuple
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+VALID_REPORT_TYPES = ["garbage", "labour", "electrician", "plumber", "all"]
+
+
+class ProcessedImage(NamedTuple):
+    image_url: Optional[str]
+    report_type: Optional[str]
+    model_version: Optional[str] = None  # Set when the classifier picked the type
+    embedding: Optional[List[float]] = None  # Image embedding, if the classifier returned one
+
+
+def normalize_report_type(report_type: Optional[str]) -> str:
+    """
+    Return the report type if it is valid, 'miscellaneous' otherwise.
+    """
+    if report_type not in VALID_REPORT_TYPES:
+        logger.warning(f"Invalid report type determined: '{report_type}'. Defaulting to 'miscellaneous'.")
+        return "miscellaneous"
+    return report_type
+
+
+async def upload_report_image(base64_image: str, image_type: str) -> Optional[str]:
+    """
+    Upload a report image to S3 within its own timeout budget.
+    Returns the image URL, or None if the upload failed or timed out.
+    """
+    try:
+        if not base64_image.strip():
+            logger.warning("Base64 image string is empty")
+            raise ValueError("Base64 image string is empty")
+        image_url = await asyncio.wait_for(
+            upload_base64_image_to_s3(base64_image, image_type),
+            timeout=S3_UPLOAD_TIMEOUT_SECONDS
+        )
+        logger.info(f"Image uploaded successfully, URL: {image_url}")
+        return image_url
+    except asyncio.TimeoutError:
+        logger.error(f"Image upload timed out after {S3_UPLOAD_TIMEOUT_SECONDS}s")
+    except Exception as e:
+        logger.error(f"Failed to upload image: {str(e)}", exc_info=True)
+    return None
+
+
+async def classify_report_image(
+    base64_image: str, fallback_type: Optional[str]
+) -> Tuple[Optional[str], Optional[dict]]:
+    """
+    Classify a report image within its own timeout budget and map it to a report type.
+    Returns 'miscellaneous' when the model gives no answer, and `fallback_type`
+    (the user-provided type) when the call errors or times out.
+
+    Returns (report_type, prediction); the prediction is None unless the model answered.
+    """
+    try:
+        logger.info("Attempting custom ML image classification...")
+        prediction = await asyncio.wait_for(
+            classify_image_detailed(base64_image),
+            timeout=ML_CLASSIFY_TIMEOUT_SECONDS
+        )
+
+        if prediction:
+            # Map the ML classification to our report types
+            classification_result = prediction["label"]
+            mapped_type = map_classification_to_report_type(classification_result)
+            logger.info(
+                f"ML classification successful: {classification_result} → {mapped_type} "
+                f"(model {prediction.get('model_version')})"
+            )
+            return mapped_type, prediction
+
+        logger.warning("ML classification failed or returned null. Defaulting to 'miscellaneous'.")
+        return "miscellaneous", None
+    except asyncio.TimeoutError:
+        logger.error(f"ML classification timed out after {ML_CLASSIFY_TIMEOUT_SECONDS}s")
+    except Exception as e:
+        logger.error(f"ML classification failed: {str(e)}", exc_info=True)
+    logger.warning(f"Falling back to user-provided type: {fallback_type}")
+    return fallback_type, None
+
+
+async def process_report_image(
+    base64_image: str, image_type: str, fallback_type: Optional[str]
+) -> ProcessedImage:
+    """
+    Upload and classify a report image concurrently.
+
+    The two calls are independent, so total latency is close to the slower
+    one rather than their sum. Each branch handles its own errors, so one
+    failing never cancels the other.
+    """
+    image_url, (report_type, prediction) = await asyncio.gather(
+        upload_report_image(base64_image, image_type),
+        classify_report_image(base64_image, fallback_type),
+    )
+    if prediction is None:
+        return ProcessedImage(image_url, report_type)
+    return ProcessedImage(image_url, report_type, prediction.get("model_version"), prediction.get("embedding"))
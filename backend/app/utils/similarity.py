@@ -0,0 +1,188 @@
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy import desc
+from app.models.report import Report
+from app.core.config import (
+    EMBEDDING_INDEX_MAX_ENTRIES, DUPLICATE_SIMILARITY_THRESHOLD, EMBEDDING_REFRESH_OVERLAP_SECONDS
+)
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence, Tuple
+import asyncio
+import logging
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def encode_embedding(embedding: Sequence[float]) -> bytes:
+    """
+    Pack an embedding for the reports.embedding column. float16 halves the
+    size and is plenty for cosine similarity.
+    """
+    return np.asarray(embedding, dtype=np.float16).tobytes()
+
+
+def decode_embedding(data: bytes) -> np.ndarray:
+    return np.frombuffer(data, dtype=np.float16).astype(np.float32)
+
+
+def normalize(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
+
+
+class VectorIndex:
+    """
+    Fixed-capacity in-memory index of unit vectors, searched by brute-force
+    dot product. Once full, the oldest entry is overwritten, so it always
+    holds the most recent `capacity` reports. Adding a report that is
+    already indexed replaces its vector in place. Tens of thousands of 256-d
+    float32 vectors take tens of MB and scan in a few milliseconds.
+    """
+
+    def __init__(self, dim: int, capacity: int):
+        self.dim = dim
+        self.capacity = capacity
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._ids = np.full(capacity, -1, dtype=np.int64)
+        self._positions: Dict[int, int] = {}  # report_id -> row
+        self._next = 0
+        self.size = 0
+
+    def add(self, report_id: int, vector: Sequence[float]) -> None:
+        position = self._positions.get(report_id)
+        if position is not None:
+            self._vectors[position] = normalize(vector)
+            return
+        evicted = int(self._ids[self._next])
+        if evicted != -1:
+            del self._positions[evicted]
+        self._vectors[self._next] = normalize(vector)
+        self._ids[self._next] = report_id
+        self._positions[report_id] = self._next
+        self._next = (self._next + 1) % self.capacity
+        self.size = min(self.size + 1, self.capacity)
+
+    def search(
+        self, vector: Sequence[float], k: int, min_similarity: float = 0.0, exclude_id: Optional[int] = None
+    ) -> List[Tuple[int, float]]:
+        """
+        Up to `k` (report_id, cosine similarity) pairs, most similar first.
+        """
+        if not self.size:
+            return []
+        scores = self._vectors[:self.size] @ normalize(vector)
+        ids = self._ids[:self.size]
+        candidates = np.flatnonzero((scores >= min_similarity) & (ids != (exclude_id or -1)))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        candidates = candidates[np.argsort(-scores[candidates])]
+        return [(int(ids[i]), float(scores[i])) for i in candidates]
+
+
+class ReportSimilarityIndex:
+    """
+    Embeddings of recent reports, one VectorIndex per model version since
+    embeddings from different models aren't comparable.
+
+    The database is the source of truth: on first use the index loads the
+    most recently written embeddings, and before each search it pulls in
+    embeddings written since (by any instance), by Report.embedding_updated_at.
+    That is set when the embedding is stored, which for queued images is
+    well after the report row and its ID were created. Each refresh re-reads
+    the last `overlap` before the newest timestamp seen, so rows committed
+    out of order (or stamped by an instance with a slightly behind clock) are
+    still picked up; re-adding an indexed report is a no-op.
+    """
+
+    def __init__(self, capacity: int, overlap: timedelta = timedelta(seconds=60)):
+        self.capacity = capacity
+        self.overlap = overlap
+        self._indexes: Dict[str, VectorIndex] = {}
+        self._last_updated_at: Optional[datetime] = None
+        self._lock = asyncio.Lock()
+        self.searches = 0
+
+    def add(self, report_id: int, model_version: Optional[str], embedding: Sequence[float]) -> None:
+        key = model_version or "unknown"
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = VectorIndex(len(embedding), self.capacity)
+        elif len(embedding) != index.dim:
+            logger.warning(f"Skipping report {report_id}: embedding size {len(embedding)} != {index.dim}")
+            return
+        index.add(report_id, embedding)
+
+    async def refresh(self, db: AsyncSession) -> None:
+        async with self._lock:
+            query = select(
+                Report.id, Report.model_version, Report.embedding, Report.embedding_updated_at
+            ).where(Report.embedding.isnot(None), Report.embedding_updated_at.isnot(None))
+            cold_start = self._last_updated_at is None
+            if cold_start:
+                # The most recently written embeddings, loaded oldest first so they land in order
+                # (repeated until there is at least one, which is cheap on an empty result)
+                query = query.order_by(desc(Report.embedding_updated_at), desc(Report.id)).limit(self.capacity)
+            else:
+                query = query.where(
+                    Report.embedding_updated_at >= self._last_updated_at - self.overlap
+                ).order_by(Report.embedding_updated_at, Report.id)
+            rows = (await db.execute(query)).all()
+            if cold_start:
+                rows = list(reversed(rows))
+            for report_id, model_version, embedding, updated_at in rows:
+                self.add(report_id, model_version, decode_embedding(embedding))
+                if self._last_updated_at is None or updated_at > self._last_updated_at:
+                    self._last_updated_at = updated_at
+
+    async def search(
+        self,
+        db: AsyncSession,
+        model_version: Optional[str],
+        embedding: Sequence[float],
+        k: int = 5,
+        min_similarity: float = 0.0,
+        exclude_id: Optional[int] = None,
+    ) -> List[Tuple[int, float]]:
+        await self.refresh(db)
+        self.searches += 1
+        index = self._indexes.get(model_version or "unknown")
+        if index is None:
+            return []
+        return index.search(embedding, k, min_similarity, exclude_id)
+
+    async def find_duplicate(
+        self, db: AsyncSession, model_version: Optional[str], embedding: Optional[Sequence[float]]
+    ) -> Optional[int]:
+        """
+        ID of the most similar recent report if it is at least
+        DUPLICATE_SIMILARITY_THRESHOLD similar, None otherwise.
+        """
+        if not embedding:
+            return None
+        try:
+            matches = await self.search(db, model_version, embedding, k=1, min_similarity=DUPLICATE_SIMILARITY_THRESHOLD)
+        except Exception as e:
+            logger.error(f"Duplicate lookup failed: {str(e)}", exc_info=True)
+            return None
+        if matches:
+            report_id, similarity = matches[0]
+            logger.info(f"Likely duplicate of report {report_id} (similarity {similarity:.3f})")
+            return report_id
+        return None
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "searches": self.searches,
+            "last_embedding_updated_at": self._last_updated_at.isoformat() if self._last_updated_at else None,
+            "indexes": {
+                version: {"dim": index.dim, "size": index.size}
+                for version, index in self._indexes.items()
+            },
+        }
+
+
+report_similarity_index = ReportSimilarityIndex(
+    EMBEDDING_INDEX_MAX_ENTRIES, timedelta(seconds=EMBEDDING_REFRESH_OVERLAP_SECONDS)
+)
@@ -6,7 +6,7 @@ from fastapi import HTTPException
 from fastapi.responses import HTMLResponse
 from fastapi.requests import Request
 import logging
-from app.core.config import ENVIRONMENT, PROJECT_NAME, API_V1_STR, DATABASE_URL
+from app.core.config import ENVIRONMENT, PROJECT_NAME, API_V1_STR, DATABASE_URL, IMAGE_JOB_WORKER
 from app.api.api import api_router
 
 #logs the env variables in development mode
@@ -35,6 +35,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 # Startup func to log environment variables and check db connection
@@ -61,6 +62,31 @@ async def startup_db_client():
         env_vars = {k: v for k, v in os.environ.items() if "SECRET" not in k and "KEY" not in k and "PASSWORD" not in k}
         logger.info(f"Environment variables: {env_vars}")
 
+# Optionally run the report image worker inside the API process (local development)
+@app.on_event("startup")
+async def start_image_job_worker():
+    if IMAGE_JOB_WORKER == "inline":
+        import asyncio
+        from app.utils.image_jobs import ImageJobWorker
+
+        app.state.image_job_worker = ImageJobWorker()
+        app.state.image_job_task = asyncio.create_task(app.state.image_job_worker.run_forever())
+        logger.info("Started inline image job worker")
+
+@app.on_event("shutdown")
+async def stop_image_job_worker():
+    task = getattr(app.state, "image_job_task", None)
+    if task:
+        app.state.image_job_worker.stop()
+        task.cancel()
+
+# Close pooled outbound connections
+@app.on_event("shutdown")
+async def close_ml_client():
+    from app.utils.ml_client import close_http_client
+
+    await close_http_client()
+
 # Spotlight UI docs setup
 @app.get("/docs", include_in_schema=False)
 async def api_documentation(request: Request):
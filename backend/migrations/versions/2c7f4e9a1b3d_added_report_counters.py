@@ -0,0 +1,35 @@
+"""added report counters
+
+Revision ID: 2c7f4e9a1b3d
+Revises: 8b81eded3b4a
+Create Date: 2026-10-17 09:12:44.508113
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '2c7f4e9a1b3d'
+down_revision: Union[str, None] = '8b81eded3b4a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('vote_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('reports', sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Backfill the counters from the existing rows
+    op.execute(
+        "UPDATE reports SET "
+        "vote_count = (SELECT count(*) FROM votes WHERE votes.report_id = reports.id), "
+        "comment_count = (SELECT count(*) FROM comments WHERE comments.report_id = reports.id)"
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('reports', 'comment_count')
+    op.drop_column('reports', 'vote_count')
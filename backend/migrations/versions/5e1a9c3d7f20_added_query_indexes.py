@@ -0,0 +1,54 @@
+"""added query indexes
+
+Revision ID: 5e1a9c3d7f20
+Revises: 2c7f4e9a1b3d
+Create Date: 2026-10-17 11:03:27.114952
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5e1a9c3d7f20'
+down_revision: Union[str, None] = '2c7f4e9a1b3d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (name, table, columns) - one entry per router query shape.
+# Every feed orders by (created_at DESC, id DESC), so each index ends in those columns.
+INDEXES = [
+    # GET /reports
+    ('ix_reports_created_at_id', 'reports', ['created_at', 'id']),
+    # GET /reports?status=, GET /admin/reports?status= (role "all")
+    ('ix_reports_status_created_at_id', 'reports', ['status', 'created_at', 'id']),
+    # GET /reports/me
+    ('ix_reports_user_id_created_at_id', 'reports', ['user_id', 'created_at', 'id']),
+    # GET /admin/reports for a role-scoped admin
+    ('ix_reports_lower_type_created_at_id', 'reports', [sa.text('lower(type)'), 'created_at', 'id']),
+    ('ix_reports_lower_type_status_created_at_id', 'reports', [sa.text('lower(type)'), 'status', 'created_at', 'id']),
+    # Vote hydration (report_id IN (...)) and counter reconciliation
+    ('ix_votes_report_id_user_id', 'votes', ['report_id', 'user_id']),
+    # GET /comments/report/{id}
+    ('ix_comments_report_id_created_at_id', 'comments', ['report_id', 'created_at', 'id']),
+    # GET /chat/rooms/{id}/messages
+    ('ix_chat_messages_room_id_created_at_id', 'chat_messages', ['room_id', 'created_at', 'id']),
+]
+
+
+def upgrade() -> None:
+    # CONCURRENTLY can't run inside a transaction, and keeps the tables writable while building
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, unique=False,
+                            postgresql_concurrently=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table,
+                          postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,44 @@
+"""added report image jobs
+
+Revision ID: 7a3b8d2e6c41
+Revises: 5e1a9c3d7f20
+Create Date: 2026-10-17 13:41:08.632710
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3b8d2e6c41'
+down_revision: Union[str, None] = '5e1a9c3d7f20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('report_image_jobs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('report_id', sa.Integer(), nullable=False),
+    sa.Column('base64_image', sa.Text(), nullable=True),
+    sa.Column('image_type', sa.String(), nullable=False),
+    sa.Column('fallback_type', sa.String(), nullable=True),
+    sa.Column('status', sa.String(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('now()'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['report_id'], ['reports.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_report_image_jobs_id'), 'report_image_jobs', ['id'], unique=False)
+    op.create_index('ix_report_image_jobs_status_next_attempt_at', 'report_image_jobs', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_report_image_jobs_status_next_attempt_at', table_name='report_image_jobs')
+    op.drop_index(op.f('ix_report_image_jobs_id'), table_name='report_image_jobs')
+    op.drop_table('report_image_jobs')
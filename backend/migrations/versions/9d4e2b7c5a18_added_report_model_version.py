@@ -0,0 +1,26 @@
+"""added report model version
+
+Revision ID: 9d4e2b7c5a18
+Revises: 7a3b8d2e6c41
+Create Date: 2026-10-17 16:22:51.904417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d4e2b7c5a18'
+down_revision: Union[str, None] = '7a3b8d2e6c41'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('model_version', sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('reports', 'model_version')
@@ -0,0 +1,33 @@
+"""added report embeddings
+
+Revision ID: b3f61c9e2d47
+Revises: 9d4e2b7c5a18
+Create Date: 2026-10-18 10:05:37.219846
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f61c9e2d47'
+down_revision: Union[str, None] = '9d4e2b7c5a18'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('embedding', sa.LargeBinary(), nullable=True))
+    op.add_column('reports', sa.Column('duplicate_of_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'fk_reports_duplicate_of_id_reports', 'reports', 'reports',
+        ['duplicate_of_id'], ['id'], ondelete='SET NULL'
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('fk_reports_duplicate_of_id_reports', 'reports', type_='foreignkey')
+    op.drop_column('reports', 'duplicate_of_id')
+    op.drop_column('reports', 'embedding')
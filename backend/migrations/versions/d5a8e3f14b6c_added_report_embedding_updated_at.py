@@ -0,0 +1,33 @@
+"""added report embedding_updated_at
+
+Revision ID: d5a8e3f14b6c
+Revises: b3f61c9e2d47
+Create Date: 2026-10-18 16:42:11.508313
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd5a8e3f14b6c'
+down_revision: Union[str, None] = 'b3f61c9e2d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('reports', sa.Column('embedding_updated_at', sa.DateTime(timezone=True), nullable=True))
+    op.create_index(op.f('ix_reports_embedding_updated_at'), 'reports', ['embedding_updated_at'], unique=False)
+    # Existing embeddings were written when the report was created or last updated
+    op.execute(
+        "UPDATE reports SET embedding_updated_at = COALESCE(updated_at, created_at) "
+        "WHERE embedding IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_reports_embedding_updated_at'), table_name='reports')
+    op.drop_column('reports', 'embedding_updated_at')